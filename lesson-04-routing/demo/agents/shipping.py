@@ -1,7 +1,6 @@
 import os
-import json
 import logging
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, AsyncGenerator
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LlmAgent, InvocationContext, BaseAgent
 from google.adk.events import Event
@@ -50,6 +49,9 @@ class PlaceOrderOutput(BaseModel):
     subtotal: float
     address: AddressOutput = Field(description="The shipping address.")
 
+# The session state key that the place_order_agent saves its output under
+PLACED_ORDER_KEY = "placed_order"
+
 # --- Tools ---
 
 def place_order(order_id: str, address: dict):
@@ -200,30 +202,21 @@ class ShippingRouter(BaseAgent):
             standard_agent=standard_agent,
         )
 
-    async def _run_async_impl(self, invocation_context: InvocationContext) -> AsyncGenerator[Event, None]:
-        # We need the event generated by the "place_order_agent" since it
-        # included the subtotal as part of its output
-        subtotal = 0
-        events = invocation_context.session.events
-        for event in reversed(events):
-            logger.info(f"Processing event: {event}")
-            if event.author == "place_order_agent":
-                try:
-                    # The content is expected to be a JSON string representing PlaceOrderOutput
-                    text = event.content.parts[0].text
-                    # It might be wrapped in markdown code block, clean it if necessary
-                    if text.startswith("```json"):
-                        text = text[7:-3]
-                    elif text.startswith("```"):
-                        text = text[3:-3]
-
-                    data = json.loads(text)
-                    subtotal = data.get("subtotal", 0)
-                    break
-                except (json.JSONDecodeError, AttributeError, IndexError):
-                    # Fallback or error logging could go here
-                    pass
+    def get_subtotal(self, invocation_context: InvocationContext) -> float:
+        # The place_order_agent saves its output in the session state under
+        # its output_key, so we can read the subtotal directly instead of
+        # searching back through every event in the session for it
+        placed_order = invocation_context.session.state.get(PLACED_ORDER_KEY)
+        if placed_order is None:
+            return 0
+        try:
+            return PlaceOrderOutput.model_validate(placed_order).subtotal
+        except ValidationError as e:
+            logger.warning(f"Unexpected {PLACED_ORDER_KEY} in session state: {e}")
+            return 0
 
+    async def _run_async_impl(self, invocation_context: InvocationContext) -> AsyncGenerator[Event, None]:
+        subtotal = self.get_subtotal(invocation_context)
         is_free = subtotal >= self.free_threshold
 
         if is_free:
@@ -272,6 +265,7 @@ place_order_agent = LlmAgent(
     instruction=read_prompt("place-order-prompt.txt"),
     tools=[place_order],
     output_schema=PlaceOrderOutput,
+    output_key=PLACED_ORDER_KEY,
 )
 
 order_summary_agent = LlmAgent(
@@ -0,0 +1,95 @@
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.genai import types
+
+from agents.shipping import PLACED_ORDER_KEY, shipping_router_agent
+
+# Shows how long the ShippingRouter takes to find the order subtotal as the
+# session history grows.
+#
+# It compares reading the place_order_agent output from the session state,
+# which is what the router does, with the way it used to find it: searching
+# back through the session events and parsing the JSON text of each one.
+# The order is placed at the start of each session, followed by chat
+# messages, so the search has to go through the whole history. That is
+# also what happens whenever the order output isn't there at all.
+#
+# Run it from this directory: python router_benchmark.py
+
+PLACED_ORDER = {
+    "cart": ["P001", "P002"],
+    "subtotal": 319.98,
+    "address": {
+        "name": "Jane Doe",
+        "address_1": "12 Third St",
+        "city": "Forth",
+        "state": "NY",
+        "postal_code": "56789",
+    },
+}
+
+def text_event(author: str, text: str) -> Event:
+    role = "user" if author == "user" else "model"
+    return Event(
+        author=author,
+        invocation_id="benchmark",
+        content=types.Content(role=role, parts=[types.Part(text=text)]),
+    )
+
+def make_session(event_count: int) -> Session:
+    events = [text_event("place_order_agent", f"```json\n{json.dumps(PLACED_ORDER)}\n```")]
+    for i in range(1, event_count):
+        if i % 2:
+            events.append(text_event("user", f"Can you tell me more about item {i}? I am thinking about buying it."))
+        else:
+            events.append(text_event("shipping_agent", f"Item {i} is one of our most popular products and ships in two days."))
+    return Session(
+        id=f"benchmark-{event_count}",
+        app_name="benchmark",
+        user_id="user",
+        state={PLACED_ORDER_KEY: PLACED_ORDER},
+        events=events,
+    )
+
+def subtotal_from_events(invocation_context) -> float:
+    """How the router used to find the subtotal."""
+    for event in reversed(invocation_context.session.events):
+        if event.author == "place_order_agent":
+            try:
+                text = event.content.parts[0].text
+                if text.startswith("```json"):
+                    text = text[7:-3]
+                elif text.startswith("```"):
+                    text = text[3:-3]
+                return json.loads(text).get("subtotal", 0)
+            except (json.JSONDecodeError, AttributeError, IndexError):
+                pass
+    return 0
+
+def time_per_call(function, context, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        function(context)
+    return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark how the shipping router finds the order subtotal.")
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma separated numbers of session events.")
+    parser.add_argument("--calls", type=int, default=200, help="Calls to time for each size.")
+    args = parser.parse_args()
+
+    print(f"{'events':>8} {'search events':>15} {'session state':>15}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        context = SimpleNamespace(session=make_session(size))
+        assert subtotal_from_events(context) == shipping_router_agent.get_subtotal(context)
+        scan = time_per_call(subtotal_from_events, context, args.calls)
+        state = time_per_call(shipping_router_agent.get_subtotal, context, args.calls)
+        print(f"{size:>8,} {scan * 1e6:>12.1f} us {state * 1e6:>12.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import os
 from google.adk.agents import Agent
 from .agents.search import search_agent
 from .agents.inventory import inventory_agent
-from .agents.cart import cart_agent
+from .agents.cart import cart_agent, edit_cart_agent, place_order_agent
 
 model = "gemini-2.5-flash"
 
@@ -19,5 +19,5 @@ root_agent = Agent(
     description="Orchestrates the shopping experience.",
     model=model,
     instruction=orchestrator_instruction,
-    sub_agents=[search_agent, inventory_agent, cart_agent],
+    sub_agents=[search_agent, inventory_agent, cart_agent, edit_cart_agent, place_order_agent],
 )
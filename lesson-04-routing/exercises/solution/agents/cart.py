@@ -3,8 +3,10 @@ from typing import Optional
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LlmAgent
 
 from .products import products
-from .order_data import orders, OrderStatus, get_next_order_id
-from .inventory import inventory_data_agent
+from .order_data import OrderStatus
+from .order_store import get_order_store
+from .reservations import get_reservations
+from .inventory import check_inventory_agent
 
 model = "gemini-2.5-flash"
 
@@ -21,36 +23,212 @@ def get_order(order_id: Optional[str] = None):
     Args:
         order_id: Optional existing order ID.
     """
+    store = get_order_store()
     if order_id is None:
-      order_id = get_next_order_id()
-      orders[order_id] = {
-        "cart": [],
-        "address": None,
-        "order_status": None
-      }
+      order_id = store.create()
+
+    order = store.get(order_id)
+    if order is None:
+        return {"error": f"Order {order_id} not found."}
 
     # Return the order with its ID so the caller knows it
-    return {"order_id": order_id, "order": orders[order_id]}
+    return {"order_id": order_id, "order": order.to_dict()}
+
+class StockChanges:
+    """
+    The stock reserved and released for an order while it is changed.
+    Reservations are made right away, so the change can tell whether there
+    is enough in stock, and are released again if the order isn't saved.
+    Releases, and committing the reservations when the order is placed,
+    wait until it has been saved.
+    """
+
+    def __init__(self, order_id: str):
+        self.order_id = order_id
+        self.reserved = []
+        self.releases = []
+        self.commit = False
+
+    def reserve(self, product_id: str, quantity: int) -> bool:
+        reservation_id = get_reservations().reserve(product_id, quantity, holder=self.order_id)
+        if reservation_id is None:
+            return False
+        self.reserved.append(reservation_id)
+        return True
+
+    def release(self, product_id: str, quantity: int):
+        self.releases.append((product_id, quantity))
+
+    def saved(self):
+        reservations = get_reservations()
+        for product_id, quantity in self.releases:
+            reservations.release_for(self.order_id, product_id, quantity)
+        if self.commit:
+            reservations.commit_for(self.order_id)
+
+    def not_saved(self):
+        reservations = get_reservations()
+        for reservation_id in self.reserved:
+            reservations.release(reservation_id)
+
+def save_order(order_id: str, change, stock: StockChanges):
+    """
+    Changes an order with get_order_store().update(), returning what
+    change(order) returns, and then makes the stock changes it noted. If the
+    order wasn't saved, the stock reserved for it goes back instead.
+    """
+    try:
+        result = get_order_store().update(order_id, change)
+    except KeyError:
+        stock.not_saved()
+        return {"error": f"Order {order_id} not found."}
+    except BaseException:
+        stock.not_saved()
+        raise
+    stock.saved()
+    return result
+
+def change_cart(order_id: str, change):
+    """
+    Changes the cart of an order that hasn't been placed yet, returning what
+    change(order, stock) returns, or an error if the order can't be changed.
+    """
+    stock = StockChanges(order_id)
 
-def add_to_cart(order_id: str, product_id: str):
+    def change_open_order(order):
+        # Check if the order has already been placed or processed
+        if order.order_status is not None:
+            return {"error": f"Order {order_id} cannot be modified as its status is already set to {order.order_status.value}"}
+        try:
+            return change(order, stock)
+        except ValueError as e:
+            return {"error": str(e)}
+
+    return save_order(order_id, change_open_order, stock)
+
+def cart_result(order, message: str) -> dict:
+    return {"status": "success", "message": message, "cart": order.cart(), "subtotal": order.subtotal}
+
+def out_of_stock(product_id: str) -> dict:
+    return {"error": f"There aren't enough {products[product_id]['name']} in stock."}
+
+def hold_stock(stock: StockChanges, order, product_id: str, before: int) -> bool:
+    """
+    After the quantity of a product in a cart changes from before, reserves
+    the extra stock it needs or releases what it no longer does. If there
+    isn't enough in stock, the quantity is set back to before.
+    """
+    change = order.quantity(product_id) - before
+    if change > 0 and not stock.reserve(product_id, change):
+        order.set_quantity(product_id, before)
+        return False
+    if change < 0:
+        stock.release(product_id, -change)
+    return True
+
+def add_to_cart(order_id: str, product_id: str, quantity: int = 1):
     """Adds a product to the specified order's cart.
 
     Args:
         order_id: The ID of the order.
         product_id: The ID of the product to add.
+        quantity: How many to add. Defaults to 1.
     """
     if product_id not in products:
         return {"error": "Product ID not found"}
 
-    order_info = get_order(order_id)
-    order = order_info["order"]
+    def add(order, stock):
+        before = order.quantity(product_id)
+        order.add(product_id, quantity)
+        if not hold_stock(stock, order, product_id, before):
+            return out_of_stock(product_id)
+        return cart_result(order, f"Added {quantity} x {products[product_id]['name']} to cart.")
 
-    # Check if the order has already been placed or processed
-    if order["order_status"] is not None:
-        return {"error": f"Order {order_id} cannot be modified as its status is already set to {order['order_status'].value}"}
+    return change_cart(order_id, add)
 
-    order["cart"].append(product_id)
-    return {"status": "success", "message": f"Added {products[product_id]['name']} to cart.", "cart": order["cart"]}
+def remove_from_cart(order_id: str, product_id: str, quantity: Optional[int] = None):
+    """Removes a product from the specified order's cart.
+
+    Args:
+        order_id: The ID of the order.
+        product_id: The ID of the product to remove.
+        quantity: How many to remove. If not given, removes all of them.
+    """
+    def remove(order, stock):
+        before = order.quantity(product_id)
+        left = order.remove(product_id, quantity)
+        hold_stock(stock, order, product_id, before)
+        return cart_result(order, f"{left} of {product_id} left in the cart.")
+
+    return change_cart(order_id, remove)
+
+def set_quantity(order_id: str, product_id: str, quantity: int):
+    """Sets how many of a product are in the specified order's cart.
+
+    Args:
+        order_id: The ID of the order.
+        product_id: The ID of the product.
+        quantity: How many should be in the cart. 0 removes the product.
+    """
+    if product_id not in products:
+        return {"error": "Product ID not found"}
+
+    def set_cart_quantity(order, stock):
+        before = order.set_quantity(product_id, quantity)
+        if not hold_stock(stock, order, product_id, before):
+            return out_of_stock(product_id)
+        return cart_result(order, f"The cart now has {quantity} x {products[product_id]['name']}.")
+
+    return change_cart(order_id, set_cart_quantity)
+
+def compute_subtotal(order_id: str):
+    """Gets the total price of everything in the specified order's cart.
+
+    Args:
+        order_id: The ID of the order.
+    """
+    order = get_order_store().get(order_id)
+    if order is None:
+        return {"error": f"Order {order_id} not found."}
+    return {"order_id": order_id, "subtotal": order.subtotal}
+
+def place_order(order_id: str, address: dict):
+    """Places an order by adding the shipping address and setting status to PLACED.
+
+    The stock reserved for the cart is committed. Anything whose reservation
+    ran out is reserved again, and if it is no longer in stock the order
+    isn't placed.
+
+    Args:
+        order_id: The ID of the order.
+        address: Dictionary with name, address_1, address_2, city, state, postal_code.
+    """
+    stock = StockChanges(order_id)
+
+    def place(order):
+        if order.order_status is not None:
+            return {"error": f"Order {order_id} has already been {order.order_status.value}"}
+        if not order.items:
+            return {"error": f"Order {order_id} has nothing in the cart"}
+
+        # Renewed first, so nothing the cart holds can run out while placing it
+        reservations = get_reservations()
+        reservations.renew(order_id)
+        missing = []
+        for item in order.cart():
+            short = item["quantity"] - reservations.held_quantity(order_id, item["product_id"])
+            if short > 0 and not stock.reserve(item["product_id"], short):
+                missing.append(products[item["product_id"]]["name"])
+        if missing:
+            return {"error": f"Order {order_id} can't be placed, as these are no longer in stock: {', '.join(missing)}"}
+        # Committed once the order has been saved as placed
+        stock.commit = True
+
+        order.address = address
+        order.order_status = OrderStatus.PLACED
+        return {"status": "success", "order_id": order_id, **order.to_dict()}
+
+    return save_order(order_id, place, stock)
 
 # --- Sub-Agents ---
 
@@ -70,11 +248,27 @@ add_item_agent = LlmAgent(
     tools=[add_to_cart],
 )
 
+edit_cart_agent = LlmAgent(
+    name="edit_cart_agent",
+    description="Changes the quantities in the cart, removes items from it, and prices it.",
+    model=model,
+    instruction=read_prompt("edit-cart-prompt.txt"),
+    tools=[get_order, set_quantity, remove_from_cart, compute_subtotal],
+)
+
+place_order_agent = LlmAgent(
+    name="place_order_agent",
+    description="Places the order in the cart with the shipping address.",
+    model=model,
+    instruction=read_prompt("place-order-prompt.txt"),
+    tools=[get_order, place_order],
+)
+
 # Parallel Prep: Get Order + Check Inventory
 cart_prep_agent = ParallelAgent(
     name="cart_prep_agent",
     description="Prepares for adding to cart by ensuring order exists and checking inventory.",
-    sub_agents=[get_order_agent, inventory_data_agent],
+    sub_agents=[get_order_agent, check_inventory_agent],
 )
 
 # Sequential Workflow: Prep -> Add Item
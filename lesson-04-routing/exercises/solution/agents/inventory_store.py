@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Optional
+from .products import product_counts
+
+# How many of each product are in stock.
+#
+# check_inventory used to read product_counts, and nothing ever took
+# anything out of it, so two sessions could both see the last one of a
+# product and both sell it. Stock is now kept in an Inventory, which only
+# changes it in ways that are safe when many sessions do it at once:
+#     inventory.count(product_id)           how many are in stock, or None
+#     inventory.take(product_id, quantity)  takes them if there are enough
+#     inventory.put_back(product_id, quantity)
+# take() checks that there are enough and takes them in one step, so it
+# either takes all of them or none, and the count never goes below zero.
+# Nothing takes stock directly; reservations.py does it when a product is
+# added to a cart. Each change is passed, with the new count, to every
+# function given to inventory.listen(), which is how reorders.py finds out
+# a product is running low.
+#
+# MemoryInventory keeps the counts in this process, with a lock for each
+# product. SQLiteInventory keeps them in a SQLite file, and takes stock
+# with a single
+#     UPDATE inventory SET quantity = quantity - ? WHERE product_id = ? AND quantity >= ? RETURNING quantity
+# so several processes can share it. Which one is used follows ORDER_STORE.
+# The file isn't the one the orders are in, since stock is taken while an
+# order is being changed, and SQLite only lets one connection write to a
+# file at a time.
+
+class Inventory(ABC):
+    """How many of each product are in stock. See the top of this module."""
+
+    def __init__(self):
+        self.listeners = []
+
+    def listen(self, listener: Callable[[str, int], None]):
+        """Calls listener(product_id, count) after each change to the stock."""
+        self.listeners.append(listener)
+
+    def changed(self, product_id: str, count: int):
+        for listener in self.listeners:
+            listener(product_id, count)
+
+    @abstractmethod
+    def count(self, product_id: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def take(self, product_id: str, quantity: int) -> bool:
+        """Takes some of a product out of stock, if there are enough.
+
+        Args:
+            product_id: The ID of the product.
+            quantity: How many to take.
+
+        Returns:
+            True if they were taken, or False if there weren't enough in
+            stock and nothing was taken.
+        """
+
+    @abstractmethod
+    def put_back(self, product_id: str, quantity: int):
+        """Puts some of a product back in stock, or adds new stock."""
+
+class MemoryInventory(Inventory):
+
+    def __init__(self, counts: dict):
+        super().__init__()
+        self.counts = dict(counts)
+        self.locks = {product_id: threading.Lock() for product_id in self.counts}
+
+    def count(self, product_id: str) -> Optional[int]:
+        return self.counts.get(product_id)
+
+    def take(self, product_id: str, quantity: int) -> bool:
+        lock = self.locks.get(product_id)
+        if lock is None:
+            return False
+        with lock:
+            if self.counts[product_id] < quantity:
+                return False
+            self.counts[product_id] -= quantity
+            count = self.counts[product_id]
+        self.changed(product_id, count)
+        return True
+
+    def put_back(self, product_id: str, quantity: int):
+        with self.locks[product_id]:
+            self.counts[product_id] += quantity
+            count = self.counts[product_id]
+        self.changed(product_id, count)
+
+class SQLiteInventory(Inventory):
+
+    def __init__(self, path: str, counts: dict):
+        super().__init__()
+        self.path = path
+        self.local = threading.local()
+        db = self.connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS inventory ("
+            "product_id TEXT PRIMARY KEY, quantity INTEGER NOT NULL CHECK (quantity >= 0))"
+        )
+        # Only the products that aren't there yet, so restarting doesn't
+        # undo what has been sold
+        db.executemany(
+            "INSERT OR IGNORE INTO inventory (product_id, quantity) VALUES (?, ?)",
+            counts.items(),
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so each has its own
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.local.db = db
+        return db
+
+    def count(self, product_id: str) -> Optional[int]:
+        row = self.connection().execute(
+            "SELECT quantity FROM inventory WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def take(self, product_id: str, quantity: int) -> bool:
+        # The WHERE clause does the check, so no other session can take the
+        # same stock between checking and taking it
+        # fetchall() finishes the statement, which is what commits it
+        rows = self.connection().execute(
+            "UPDATE inventory SET quantity = quantity - ? WHERE product_id = ? AND quantity >= ? RETURNING quantity",
+            (quantity, product_id, quantity),
+        ).fetchall()
+        if not rows:
+            return False
+        self.changed(product_id, rows[0][0])
+        return True
+
+    def put_back(self, product_id: str, quantity: int):
+        rows = self.connection().execute(
+            "UPDATE inventory SET quantity = quantity + ? WHERE product_id = ? RETURNING quantity",
+            (quantity, product_id),
+        ).fetchall()
+        if rows:
+            self.changed(product_id, rows[0][0])
+
+@lru_cache(maxsize=1)
+def get_inventory() -> Inventory:
+    """
+    The shared inventory, starting from product_counts. It is kept in
+    memory, or in the INVENTORY_STORE_PATH SQLite file if ORDER_STORE is
+    "sqlite".
+    """
+    if os.environ.get("ORDER_STORE", "memory").lower() == "sqlite":
+        return SQLiteInventory(os.environ.get("INVENTORY_STORE_PATH", "inventory.db"), product_counts)
+    return MemoryInventory(product_counts)
@@ -1,4 +1,9 @@
+import sys
+from array import array
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Optional
+from .products import products
 
 class OrderStatus(Enum):
     PLACED = "placed"
@@ -6,23 +11,189 @@ class OrderStatus(Enum):
     SHIPPED = "shipped"
     RECEIVED = "received"
 
-# Shared dictionary for orders
+# How an order is kept in memory.
+#
+# An order used to be a dict holding a list with the ID of every product
+# in the cart, once for each one bought. With many open carts, the dicts,
+# the lists and the pointers in them take up most of the memory. An Order
+# has fixed slots instead of a dict, and keeps its cart as one array of
+# 16-bit numbers: the position of each product in the catalog, followed by
+# how many of it are in the cart. Each product is in the array once,
+# however many of it were added. The product IDs are only looked up, from
+# the interned IDs in CATALOG, when the order is turned back into a dict
+# with to_dict() for a tool to return.
+#
+# An Order also keeps the subtotal of its cart, in cents so that it never
+# drifts from rounding. Adding, removing or changing the quantity of a
+# product changes it by the price of that product times the change in
+# quantity, so pricing an order never has to go through the cart.
+#
+# order_memory_benchmark.py compares the memory used by each layout.
+
+# Every product ID, in catalog order, and the position of each one
+CATALOG = tuple(sys.intern(product_id) for product_id in products)
+CATALOG_INDEX = {product_id: index for index, product_id in enumerate(CATALOG)}
+
+# The price of each product in cents, by catalog position
+PRICES = tuple(round(products[product_id]["price"] * 100) for product_id in CATALOG)
+
+# The most of one product a cart can hold, the largest 16-bit number
+MAX_QUANTITY = 0xFFFF
+
+def empty_cart() -> array:
+    return array("H")
+
+@dataclass(slots=True)
+class Order:
+    """
+    An order. items holds the cart as pairs of catalog position and
+    quantity, in the order the products were first added, and
+    subtotal_cents the total price of everything in it.
+    """
+
+    items: array = field(default_factory=empty_cart)
+    subtotal_cents: int = 0
+    address: Optional[dict] = None
+    order_status: Optional[OrderStatus] = None
+
+    def find(self, index: int) -> int:
+        """Where the product at this catalog position is in items, or -1."""
+        for i in range(0, len(self.items), 2):
+            if self.items[i] == index:
+                return i
+        return -1
+
+    def quantity(self, product_id: str) -> int:
+        """How many of a product are in the cart."""
+        index = CATALOG_INDEX.get(product_id)
+        i = self.find(index) if index is not None else -1
+        return self.items[i + 1] if i >= 0 else 0
+
+    def set_quantity(self, product_id: str, quantity: int) -> int:
+        """Sets how many of a product are in the cart, returning how many were.
+
+        Args:
+            product_id: The ID of the product, which must be in the catalog.
+            quantity: How many should be in the cart. 0 takes it out.
+
+        Raises:
+            ValueError: If the product isn't in the catalog, or the quantity
+                is less than 0 or more than MAX_QUANTITY.
+        """
+        index = CATALOG_INDEX.get(product_id)
+        if index is None:
+            raise ValueError(f"Product {product_id} is not in the catalog")
+        if not 0 <= quantity <= MAX_QUANTITY:
+            raise ValueError(f"A cart can hold between 0 and {MAX_QUANTITY} of {product_id}")
+        i = self.find(index)
+        before = self.items[i + 1] if i >= 0 else 0
+        if quantity == 0:
+            if i >= 0:
+                del self.items[i:i + 2]
+        elif i >= 0:
+            self.items[i + 1] = quantity
+        else:
+            self.items.extend((index, quantity))
+        self.subtotal_cents += (quantity - before) * PRICES[index]
+        return before
+
+    def add(self, product_id: str, quantity: int = 1):
+        """Adds some of a product to the cart.
+
+        Args:
+            product_id: The ID of the product, which must be in the catalog.
+            quantity: How many to add.
+
+        Raises:
+            ValueError: If the product isn't in the catalog, the quantity
+                isn't at least 1, or the cart would hold more than
+                MAX_QUANTITY of it.
+        """
+        if quantity < 1:
+            raise ValueError("The quantity to add must be at least 1")
+        self.set_quantity(product_id, self.quantity(product_id) + quantity)
+
+    def remove(self, product_id: str, quantity: Optional[int] = None) -> int:
+        """Takes some of a product out of the cart, returning how many are left.
+
+        Args:
+            product_id: The ID of the product.
+            quantity: How many to take out. None, or more than are in the
+                cart, takes all of them out.
+
+        Raises:
+            ValueError: If the product isn't in the cart, or the quantity
+                isn't at least 1.
+        """
+        before = self.quantity(product_id)
+        if before == 0:
+            raise ValueError(f"Product {product_id} is not in the cart")
+        if quantity is not None and quantity < 1:
+            raise ValueError("The quantity to remove must be at least 1")
+        left = max(before - quantity, 0) if quantity is not None else 0
+        self.set_quantity(product_id, left)
+        return left
+
+    @property
+    def subtotal(self) -> float:
+        """The total price of everything in the cart."""
+        return self.subtotal_cents / 100
+
+    def item_count(self) -> int:
+        """How many things are in the cart, counting each one bought."""
+        return sum(self.items[1::2])
+
+    def cart(self) -> list[dict]:
+        """The cart as a list of product IDs and quantities."""
+        return [
+            {"product_id": CATALOG[self.items[i]], "quantity": self.items[i + 1]}
+            for i in range(0, len(self.items), 2)
+        ]
+
+    def copy(self) -> "Order":
+        """A copy of the order that can be changed without changing this one."""
+        return Order(
+            array("H", self.items),
+            self.subtotal_cents,
+            dict(self.address) if self.address is not None else None,
+            self.order_status,
+        )
+
+    def to_dict(self) -> dict:
+        """The order as plain values, for tools to return."""
+        return {
+            "cart": self.cart(),
+            "subtotal": self.subtotal,
+            "address": self.address,
+            "order_status": self.order_status.value if self.order_status is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Order":
+        """
+        An order from a dict like the one to_dict() returns. The cart can
+        also be a list of product IDs, one for each one bought, the way
+        orders used to be kept.
+        """
+        order = cls(address=data.get("address"))
+        for item in data.get("cart") or []:
+            if isinstance(item, str):
+                order.add(item)
+            else:
+                order.add(item["product_id"], item["quantity"])
+        status = data.get("order_status")
+        if status is not None:
+            order.order_status = status if isinstance(status, OrderStatus) else OrderStatus(status)
+        return order
+
+# The orders that every new order store starts with. The orders themselves
+# are kept in the store from order_store.get_order_store().
 # Key: order_id (str)
-# Value: dict with keys 'cart', 'address', 'order_status'
-orders = {
-    "ORDER_001": {
+# Value: Order
+sample_orders = {
+    "ORDER_001": Order.from_dict({
         "cart": ["P001"],
         "address": None,
         "order_status": None
-    }
+    })
 }
-
-# Global counter for generating unique order IDs
-_order_counter = 1000
-
-def get_next_order_id() -> str:
-    """Generates the next sequential order ID."""
-    global _order_counter
-    _order_counter += 1
-    return f"ORDER_{_order_counter}"
-
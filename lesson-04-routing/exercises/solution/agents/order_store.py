@@ -0,0 +1,298 @@
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Optional
+from .order_data import Order, sample_orders
+
+# Where the orders are kept.
+#
+# Every tool that reads or changes an order goes through an OrderStore, so
+# the same code works whether the orders are in memory or in a database:
+#     store.create()                        a new, empty order, returning its ID
+#     store.get(order_id)                   a copy of the order, or None
+#     store.update(order_id, change)        calls change(order) and saves the order
+# update() holds the order while change() runs, so two sessions changing
+# the same order at the same time can't lose each other's changes.
+#
+# MemoryOrderStore keeps the orders in this process. They are split across
+# a number of stripes, each with its own lock, so sessions working on
+# different orders rarely wait for each other. SQLiteOrderStore keeps them
+# in a SQLite file that several processes can share.
+#
+# Order IDs come from OrderIds, which makes IDs from the time, a worker
+# number and a sequence number, so workers never hand out the same ID as
+# long as each has its own worker number. Processes sharing a SQLite file
+# claim their worker numbers in its workers table with claim_worker_id(),
+# so no two of them get the same one.
+
+# Milliseconds since 2025-01-01, 10 bits of worker number, and 12 bits of
+# sequence number for IDs made in the same millisecond
+ID_EPOCH_MS = 1735689600000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+class OrderIds:
+    """Makes order IDs that are unique across workers with different worker numbers."""
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < 1 << WORKER_BITS:
+            raise ValueError(f"worker_id must be between 0 and {(1 << WORKER_BITS) - 1}")
+        self.worker_id = worker_id
+        self.lock = threading.Lock()
+        self.last_ms = -1
+        self.sequence = 0
+
+    def next_id(self) -> str:
+        with self.lock:
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            # Never go back in time, even if the clock does
+            now = max(now, self.last_ms)
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self.sequence == 0:
+                    # Used up this millisecond, so borrow the next one
+                    now += 1
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            number = (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+        return f"ORDER_{number}"
+
+class OrderStore(ABC):
+    """Where the orders are kept. See the top of this module."""
+
+    def __init__(self, ids: OrderIds):
+        self.ids = ids
+
+    @abstractmethod
+    def create(self) -> str:
+        ...
+
+    @abstractmethod
+    def add(self, order_id: str, order: Order):
+        """Adds an order with a given ID, replacing any order with that ID."""
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[Order]:
+        ...
+
+    @abstractmethod
+    def update(self, order_id: str, change: Callable[[Order], object]):
+        """Changes an order, returning what change() returns.
+
+        If change() raises, the order is left as it was.
+
+        Args:
+            order_id: The ID of the order to change.
+            change: A function that is given the order and changes it.
+
+        Raises:
+            KeyError: If there is no order with that ID.
+        """
+
+class MemoryOrderStore(OrderStore):
+
+    def __init__(self, ids: OrderIds, stripes: int = 64):
+        super().__init__(ids)
+        self.stripes = [({}, threading.Lock()) for _ in range(stripes)]
+
+    def stripe(self, order_id: str) -> tuple[dict, threading.Lock]:
+        return self.stripes[hash(order_id) % len(self.stripes)]
+
+    def create(self) -> str:
+        order_id = self.ids.next_id()
+        orders, lock = self.stripe(order_id)
+        with lock:
+            orders[order_id] = Order()
+        return order_id
+
+    def add(self, order_id: str, order: Order):
+        orders, lock = self.stripe(order_id)
+        with lock:
+            orders[order_id] = order.copy()
+
+    def get(self, order_id: str) -> Optional[Order]:
+        orders, lock = self.stripe(order_id)
+        with lock:
+            order = orders.get(order_id)
+            return order.copy() if order is not None else None
+
+    def update(self, order_id: str, change: Callable[[Order], object]):
+        orders, lock = self.stripe(order_id)
+        with lock:
+            if order_id not in orders:
+                raise KeyError(order_id)
+            # Change a copy, so an order is left as it was if change() fails,
+            # like the SQLite store rolling back
+            order = orders[order_id].copy()
+            result = change(order)
+            orders[order_id] = order
+            return result
+
+class SQLiteOrderStore(OrderStore):
+
+    def __init__(self, ids: OrderIds, path: str):
+        super().__init__(ids)
+        self.path = path
+        self.local = threading.local()
+        db = self.connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "order_id TEXT PRIMARY KEY, cart TEXT NOT NULL, address TEXT, order_status TEXT)"
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so each has its own
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.local.db = db
+        return db
+
+    def save(self, db: sqlite3.Connection, order_id: str, order: Order):
+        # The cart is saved with product IDs rather than catalog positions,
+        # so the rows still make sense if the catalog changes
+        data = order.to_dict()
+        db.execute(
+            "INSERT OR REPLACE INTO orders (order_id, cart, address, order_status) VALUES (?, ?, ?, ?)",
+            (order_id, json.dumps(data["cart"]), json.dumps(data["address"]), data["order_status"]),
+        )
+
+    def create(self) -> str:
+        order_id = self.ids.next_id()
+        # A plain INSERT, so a duplicate ID fails instead of replacing an order
+        self.connection().execute("INSERT INTO orders (order_id, cart) VALUES (?, '[]')", (order_id,))
+        return order_id
+
+    def add(self, order_id: str, order: Order):
+        self.save(self.connection(), order_id, order)
+
+    def read(self, db: sqlite3.Connection, order_id: str) -> Optional[Order]:
+        row = db.execute(
+            "SELECT cart, address, order_status FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        cart, address, status = row
+        return Order.from_dict({
+            "cart": json.loads(cart),
+            "address": json.loads(address) if address else None,
+            "order_status": status,
+        })
+
+    def get(self, order_id: str) -> Optional[Order]:
+        return self.read(self.connection(), order_id)
+
+    def update(self, order_id: str, change: Callable[[Order], object]):
+        db = self.connection()
+        # BEGIN IMMEDIATE takes the write lock now, so no one else can
+        # change the order between reading it and saving it
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            order = self.read(db, order_id)
+            if order is None:
+                raise KeyError(order_id)
+            result = change(order)
+            self.save(db, order_id, order)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return result
+
+def claim_worker_id(path: str, worker_id: Optional[int] = None) -> int:
+    """Claims a worker number in a SQLite file, until this process exits.
+
+    Each claim is a row in the file's workers table, with the worker number
+    as its primary key, so the INSERT fails for a number that is already
+    claimed. Claims left by processes on this host that are no longer
+    running are removed first.
+
+    Args:
+        path: The SQLite file.
+        worker_id: The worker number to claim. Defaults to the lowest one
+            that isn't claimed.
+
+    Returns:
+        The worker number.
+
+    Raises:
+        ValueError: If worker_id is already claimed.
+        RuntimeError: If every worker number is claimed.
+    """
+    host, pid = socket.gethostname(), os.getpid()
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS workers ("
+        "worker_id INTEGER PRIMARY KEY, host TEXT NOT NULL, pid INTEGER NOT NULL, claimed_at REAL)"
+    )
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        for (stale,) in db.execute("SELECT pid FROM workers WHERE host = ?", (host,)).fetchall():
+            try:
+                os.kill(stale, 0)
+            except ProcessLookupError:
+                db.execute("DELETE FROM workers WHERE host = ? AND pid = ?", (host, stale))
+            except PermissionError:
+                # Running, as another user
+                pass
+        if worker_id is None:
+            claimed = {row[0] for row in db.execute("SELECT worker_id FROM workers")}
+            worker_id = next((i for i in range(1 << WORKER_BITS) if i not in claimed), None)
+            if worker_id is None:
+                raise RuntimeError(f"Every worker number in {path} is claimed")
+        try:
+            db.execute(
+                "INSERT INTO workers (worker_id, host, pid, claimed_at) VALUES (?, ?, ?, ?)",
+                (worker_id, host, pid, time.time()),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Worker number {worker_id} is already claimed in {path}") from None
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        db.close()
+        raise
+    db.close()
+    atexit.register(release_worker_id, path, worker_id)
+    return worker_id
+
+def release_worker_id(path: str, worker_id: int):
+    """Gives up a worker number claimed by this process."""
+    if not os.path.exists(path):
+        # Gone, and its claims with it
+        return
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        db.execute("DELETE FROM workers WHERE worker_id = ? AND pid = ?", (worker_id, os.getpid()))
+    finally:
+        db.close()
+
+@lru_cache(maxsize=1)
+def get_order_store() -> OrderStore:
+    """
+    The shared order store, configured from the environment. ORDER_STORE is
+    "memory" (the default) or "sqlite", with the SQLite file given by
+    ORDER_STORE_PATH. With SQLite, each process claims its own worker
+    number in the file, or the one given by ORDER_WORKER_ID, which fails
+    if another process has it.
+    """
+    worker_id = os.environ.get("ORDER_WORKER_ID")
+    worker_id = int(worker_id) if worker_id is not None else None
+    if os.environ.get("ORDER_STORE", "memory").lower() == "sqlite":
+        path = os.environ.get("ORDER_STORE_PATH", "orders.db")
+        store = SQLiteOrderStore(OrderIds(claim_worker_id(path, worker_id)), path)
+    else:
+        # The orders are only in this process, so any worker number will do
+        store = MemoryOrderStore(OrderIds(worker_id or 0))
+    for order_id, order in sample_orders.items():
+        if store.get(order_id) is None:
+            store.add(order_id, order)
+    return store
@@ -74,7 +74,8 @@ products = {
     }
 }
 
-# Shared dictionary for inventory counts
+# Inventory counts that every new inventory starts with. The counts
+# themselves are kept in inventory_store.get_inventory().
 # Key: product_id
 # Value: int (inventory count)
 product_counts = {
@@ -94,8 +95,32 @@ product_counts = {
     "P014": 25
 }
 
-# Shared dictionary for reorder status
+# Reorders that every new set of reorder records starts with. The records
+# themselves are kept in reorders.get_reorder_records().
+# Key: product_id
+# Value: str (reorder status)
 reorder_status = {
     "P003": "BACKORDERED"
 }
 
+# Reorder more of a product when its inventory count falls below this.
+# Products that aren't listed use REORDER_THRESHOLD from reorders.py.
+# Key: product_id
+# Value: int (inventory count)
+reorder_thresholds = {
+    "P001": 10,
+    "P002": 20,
+    "P003": 5,
+    "P004": 50,
+    "P005": 15,
+    "P006": 10,
+    "P007": 20,
+    "P008": 5,
+    "P009": 30,
+    "P010": 10,
+    "P011": 10,
+    "P012": 5,
+    "P013": 15,
+    "P014": 5
+}
+
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+from .inventory_store import Inventory, get_inventory
+from .products import reorder_status, reorder_thresholds
+
+# Orders more of a product when it runs low, away from the sessions that
+# sell it.
+#
+# The inventory workflow used to look at the count after every inventory
+# check, and if it was below 5, run another agent to set the product's
+# reorder status in a shared dict. That was another call to the model in
+# the middle of the user's request, and it only noticed the products that
+# someone asked about.
+#
+# Now the Inventory tells a ReorderPipeline about every change to the
+# stock. The change is appended to a deque, which is all the session
+# making it has to wait for, and the worker's event loop is woken to move
+# it onto an asyncio queue. Waking the loop is much slower than appending,
+# so it is only done when the worker is waiting for a change, not while it
+# is collecting or handling a batch. The worker, on an event loop of its
+# own, takes the changes off the queue in batches, keeps only the latest
+# count for each product, and writes a reorder record for each product
+# that has fallen below its threshold, all in one go. A product only ever
+# has one open reorder, even when several processes share the SQLite file.
+#
+# Each product has its own threshold, from reorder_thresholds in
+# products.py, or REORDER_THRESHOLD if it isn't listed there. They can be
+# changed with REORDER_THRESHOLDS, for example
+#     REORDER_THRESHOLDS=P001=20,P004=100
+
+REORDER_THRESHOLD = int(os.environ.get("REORDER_THRESHOLD", "5"))
+
+# Seconds the worker waits after a change for more to batch with it, and
+# the most changes in one batch
+BATCH_SECONDS = float(os.environ.get("REORDER_BATCH_SECONDS", "0.5"))
+MAX_BATCH = 10000
+
+def load_thresholds() -> dict:
+    """The reorder threshold of each product, with any from REORDER_THRESHOLDS."""
+    thresholds = dict(reorder_thresholds)
+    for setting in filter(None, os.environ.get("REORDER_THRESHOLDS", "").split(",")):
+        product_id, _, threshold = setting.partition("=")
+        thresholds[product_id.strip()] = int(threshold)
+    return thresholds
+
+class ReorderRecords(ABC):
+    """
+    The open reorder for each product. Each is a dict with product_id,
+    status, count (the inventory count when it was made), threshold and
+    created_at.
+    """
+
+    @abstractmethod
+    def get(self, product_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def write(self, reorders: list[dict]) -> int:
+        """
+        Writes the reorders for products that don't have one open yet,
+        returning how many were written.
+        """
+
+    @abstractmethod
+    def close(self, product_id: str):
+        """Closes the open reorder for a product, once its stock has arrived."""
+
+class MemoryReorderRecords(ReorderRecords):
+
+    def __init__(self):
+        self.reorders = {}
+        self.lock = threading.Lock()
+
+    def get(self, product_id: str) -> Optional[dict]:
+        with self.lock:
+            reorder = self.reorders.get(product_id)
+            return dict(reorder) if reorder is not None else None
+
+    def write(self, reorders: list[dict]) -> int:
+        written = 0
+        with self.lock:
+            for reorder in reorders:
+                if reorder["product_id"] not in self.reorders:
+                    self.reorders[reorder["product_id"]] = dict(reorder)
+                    written += 1
+        return written
+
+    def close(self, product_id: str):
+        with self.lock:
+            self.reorders.pop(product_id, None)
+
+class SQLiteReorderRecords(ReorderRecords):
+
+    COLUMNS = ["product_id", "status", "count", "threshold", "created_at"]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        db = self.connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS reorders ("
+            "product_id TEXT PRIMARY KEY, status TEXT NOT NULL, count INTEGER, threshold INTEGER, created_at REAL)"
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so each has its own
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.local.db = db
+        return db
+
+    def get(self, product_id: str) -> Optional[dict]:
+        row = self.connection().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM reorders WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row is not None else None
+
+    def write(self, reorders: list[dict]) -> int:
+        db = self.connection()
+        before = db.total_changes
+        # One transaction for the whole batch. The primary key makes
+        # INSERT OR IGNORE skip products that already have a reorder open.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                f"INSERT OR IGNORE INTO reorders ({', '.join(self.COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+                [tuple(reorder.get(column) for column in self.COLUMNS) for reorder in reorders],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return db.total_changes - before
+
+    def close(self, product_id: str):
+        self.connection().execute("DELETE FROM reorders WHERE product_id = ?", (product_id,))
+
+class ReorderPipeline:
+    """
+    Takes changes to the stock from the Inventories it watches, and writes
+    a reorder for each product that falls below its threshold. See the top
+    of this module.
+    """
+
+    def __init__(self, records: ReorderRecords, thresholds: dict, batch_seconds: float = BATCH_SECONDS):
+        self.records = records
+        self.thresholds = thresholds
+        self.batch_seconds = batch_seconds
+        self.loop = None
+        self.queue = None
+        self.incoming = deque()
+        self.waking = False
+        self.lock = threading.Lock()
+        self.events = 0
+        self.batches = 0
+        self.checked = 0
+        self.reorders = 0
+
+    def threshold(self, product_id: str) -> int:
+        return self.thresholds.get(product_id, REORDER_THRESHOLD)
+
+    def start(self):
+        """Starts the worker, on an event loop in a thread of its own."""
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.queue = asyncio.Queue()
+            threading.Thread(target=self.loop.run_forever, name="reorder-worker", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.run(), self.loop)
+
+    def watch(self, inventory: Inventory, products: Optional[list] = None):
+        """
+        Starts taking changes from an inventory, after checking the counts
+        it already has for the products given, or every product with a
+        threshold.
+        """
+        inventory.listen(self.emit)
+        for product_id in products if products is not None else self.thresholds:
+            count = inventory.count(product_id)
+            if count is not None:
+                self.emit(product_id, count)
+
+    def emit(self, product_id: str, count: int):
+        # Called by the Inventory from any thread. Appending to a deque is
+        # safe from any thread, while the asyncio queue is only safe from
+        # the worker's loop.
+        self.incoming.append((product_id, count))
+        if not self.waking:
+            self.waking = True
+            self.loop.call_soon_threadsafe(self.take_incoming)
+
+    def take_incoming(self):
+        # Runs on the worker's loop
+        while self.incoming:
+            self.queue.put_nowait(self.incoming.popleft())
+
+    async def run(self):
+        while True:
+            # waking is cleared before the deque is emptied, so anything
+            # appended after this has emptied it wakes the loop again
+            self.waking = False
+            self.take_incoming()
+            change = await self.queue.get()
+            # Changes made while this batch is collected and handled are
+            # only appended, and are taken with the batch or the next one
+            self.waking = True
+            if change is None:
+                break
+            # Give other changes a moment to arrive, and take them all
+            await asyncio.sleep(self.batch_seconds)
+            self.take_incoming()
+            product_id, count = change
+            latest = {product_id: count}
+            taken = 1
+            stopping = False
+            while taken < MAX_BATCH and not self.queue.empty():
+                change = self.queue.get_nowait()
+                taken += 1
+                if change is None:
+                    stopping = True
+                    break
+                product_id, count = change
+                latest[product_id] = count
+            try:
+                # Written from another thread, so the queue keeps filling meanwhile
+                await self.loop.run_in_executor(None, self.process, latest, taken)
+            except Exception as e:
+                logging.warning(f"Could not write reorders: {e}")
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+            if stopping:
+                break
+        self.loop.stop()
+
+    def process(self, latest: dict, events: int) -> int:
+        """Writes the reorders needed for the latest count of each product."""
+        now = time.time()
+        reorders = [
+            {
+                "product_id": product_id,
+                "status": "ORDERING",
+                "count": count,
+                "threshold": self.threshold(product_id),
+                "created_at": now,
+            }
+            for product_id, count in latest.items()
+            if count < self.threshold(product_id)
+        ]
+        written = self.records.write(reorders) if reorders else 0
+        with self.lock:
+            self.events += events
+            self.batches += 1
+            self.checked += len(latest)
+            self.reorders += written
+        return written
+
+    async def drain(self):
+        self.take_incoming()
+        await self.queue.join()
+
+    def flush(self, timeout: Optional[float] = None):
+        """Waits until every change emitted so far has been handled."""
+        asyncio.run_coroutine_threadsafe(self.drain(), self.loop).result(timeout)
+
+    def stop(self):
+        """Stops the worker once it has handled the changes emitted so far."""
+        if self.loop is not None:
+            self.incoming.append(None)
+            self.loop.call_soon_threadsafe(self.take_incoming)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "events": self.events,
+                "batches": self.batches,
+                "products_checked": self.checked,
+                "reorders": self.reorders,
+            }
+
+@lru_cache(maxsize=1)
+def get_reorder_records() -> ReorderRecords:
+    """
+    The shared reorder records, starting with reorder_status. They are kept
+    in memory, or with the stock in the INVENTORY_STORE_PATH SQLite file if
+    ORDER_STORE is "sqlite".
+    """
+    if os.environ.get("ORDER_STORE", "memory").lower() == "sqlite":
+        records = SQLiteReorderRecords(os.environ.get("INVENTORY_STORE_PATH", "inventory.db"))
+    else:
+        records = MemoryReorderRecords()
+    records.write([
+        {"product_id": product_id, "status": status, "count": None, "threshold": None, "created_at": None}
+        for product_id, status in reorder_status.items()
+    ])
+    return records
+
+@lru_cache(maxsize=1)
+def get_reorder_pipeline() -> ReorderPipeline:
+    """The shared reorder pipeline, watching get_inventory()."""
+    pipeline = ReorderPipeline(get_reorder_records(), load_thresholds())
+    pipeline.start()
+    pipeline.watch(get_inventory())
+    return pipeline
@@ -0,0 +1,231 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Optional
+from .inventory_store import Inventory, get_inventory
+from .reorders import get_reorder_pipeline
+
+# Holds stock for carts until their orders are placed.
+#
+# Putting a product in a cart reserves it: the stock is taken out of the
+# Inventory right away, so no other session can sell it, and is held
+# until the order is placed or the reservation runs out:
+#     reservations.reserve(product_id, quantity, ttl)   a reservation ID, or None
+#     reservations.commit(reservation_id)               the stock is sold
+#     reservations.release(reservation_id)              the stock goes back
+# A reservation is held until it is committed or released, and once it
+# has been, nothing else can happen to it. Changing its state is a
+# compare-and-swap: it only works if the reservation is still held, so if
+# an order is placed at the same moment its reservation runs out, either
+# the order gets the stock or the stock goes back, never both.
+#
+# Reservations that aren't committed within their ttl are released by a
+# sweeper thread, so abandoned carts don't keep stock forever, nor do the
+# changes to orders that failed after their stock was taken. Reservations
+# are kept in this process, so ones held by a process that stops are not
+# released.
+
+# Seconds a reservation is held, and seconds between sweeps
+RESERVATION_TTL = float(os.environ.get("RESERVATION_TTL", "900"))
+SWEEP_INTERVAL = float(os.environ.get("RESERVATION_SWEEP_INTERVAL", "30"))
+
+class ReservationState(Enum):
+    HELD = "held"
+    COMMITTED = "committed"
+    RELEASED = "released"
+
+@dataclass(slots=True)
+class Reservation:
+    reservation_id: str
+    product_id: str
+    quantity: int
+    expires_at: float
+    holder: Optional[str] = None
+    state: ReservationState = ReservationState.HELD
+
+class Reservations:
+    """
+    The reservations that are held, with the ones for each holder, such as
+    an order, so they can be found without their IDs. See the top of this
+    module.
+    """
+
+    def __init__(self, inventory: Inventory, ttl: float = RESERVATION_TTL):
+        self.inventory = inventory
+        self.ttl = ttl
+        self.held = {}
+        self.holders = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.committed = 0
+        self.released = 0
+        self.expired = 0
+        self.stopping = threading.Event()
+        self.sweeper = None
+
+    def reserve(self, product_id: str, quantity: int, ttl: Optional[float] = None,
+                holder: Optional[str] = None) -> Optional[str]:
+        """Takes some of a product out of stock and holds it.
+
+        Args:
+            product_id: The ID of the product.
+            quantity: How many to reserve.
+            ttl: Seconds to hold them before they are released. Defaults
+                to the ttl of the Reservations.
+            holder: What they are held for, such as an order ID.
+
+        Returns:
+            The reservation ID, or None if there weren't enough in stock.
+
+        Raises:
+            ValueError: If the quantity isn't at least 1.
+        """
+        if quantity < 1:
+            raise ValueError("The quantity to reserve must be at least 1")
+        if not self.inventory.take(product_id, quantity):
+            return None
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            reservation_id = f"RES_{next(self.ids)}"
+            self.held[reservation_id] = Reservation(reservation_id, product_id, quantity, expires_at, holder)
+            if holder is not None:
+                self.holders.setdefault(holder, set()).add(reservation_id)
+        return reservation_id
+
+    def finish(self, reservation_id: str, state: ReservationState) -> Optional[Reservation]:
+        # The compare-and-swap: only changes the state if it is still held.
+        # Call with the lock held.
+        reservation = self.held.pop(reservation_id, None)
+        if reservation is None:
+            return None
+        reservation.state = state
+        if reservation.holder is not None:
+            ids = self.holders[reservation.holder]
+            ids.discard(reservation_id)
+            if not ids:
+                del self.holders[reservation.holder]
+        return reservation
+
+    def commit(self, reservation_id: str) -> bool:
+        """Keeps the stock of a held reservation out of stock for good.
+
+        Returns:
+            True if it was committed, or False if it was no longer held.
+        """
+        with self.lock:
+            committed = self.finish(reservation_id, ReservationState.COMMITTED) is not None
+            self.committed += committed
+        return committed
+
+    def release(self, reservation_id: str, quantity: Optional[int] = None) -> bool:
+        """Puts the stock of a held reservation back.
+
+        Args:
+            reservation_id: The ID of the reservation.
+            quantity: How many to put back. The rest stay held. Defaults
+                to all of them.
+
+        Returns:
+            True if it was released, or False if it was no longer held.
+        """
+        with self.lock:
+            reservation = self.held.get(reservation_id)
+            if reservation is None:
+                return False
+            if quantity is not None and quantity < reservation.quantity:
+                reservation.quantity -= quantity
+            else:
+                quantity = self.finish(reservation_id, ReservationState.RELEASED).quantity
+                self.released += 1
+        # Already taken out of held, so no one else can put it back too
+        self.inventory.put_back(reservation.product_id, quantity)
+        return True
+
+    def held_for(self, holder: str, product_id: Optional[str] = None) -> list[Reservation]:
+        """The reservations held for a holder, newest first."""
+        with self.lock:
+            reservations = [self.held[reservation_id] for reservation_id in self.holders.get(holder, ())]
+        reservations = [r for r in reservations if product_id is None or r.product_id == product_id]
+        return sorted(reservations, key=lambda r: r.expires_at, reverse=True)
+
+    def held_quantity(self, holder: str, product_id: str) -> int:
+        return sum(r.quantity for r in self.held_for(holder, product_id))
+
+    def release_for(self, holder: str, product_id: str, quantity: int) -> int:
+        """Puts back up to quantity of a product held for a holder, returning how many."""
+        released = 0
+        for reservation in self.held_for(holder, product_id):
+            if released >= quantity:
+                break
+            part = min(reservation.quantity, quantity - released)
+            if self.release(reservation.reservation_id, part):
+                released += part
+        return released
+
+    def renew(self, holder: str, ttl: Optional[float] = None):
+        """Holds everything held for a holder for another ttl seconds."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            for reservation_id in self.holders.get(holder, ()):
+                self.held[reservation_id].expires_at = expires_at
+
+    def commit_for(self, holder: str) -> int:
+        """Commits everything held for a holder, returning how many reservations."""
+        return sum(self.commit(r.reservation_id) for r in self.held_for(holder))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Releases the reservations that have run out, returning how many."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            expired = [self.finish(reservation_id, ReservationState.RELEASED)
+                       for reservation_id, reservation in list(self.held.items())
+                       if reservation.expires_at <= now]
+            self.released += len(expired)
+            self.expired += len(expired)
+        for reservation in expired:
+            self.inventory.put_back(reservation.product_id, reservation.quantity)
+        return len(expired)
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL):
+        """Starts a thread that calls sweep() every interval seconds."""
+        def run():
+            while not self.stopping.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logging.warning(f"Could not release expired reservations: {e}")
+
+        with self.lock:
+            if self.sweeper is None:
+                self.sweeper = threading.Thread(target=run, name="reservation-sweeper", daemon=True)
+                self.sweeper.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "held": len(self.held),
+                "committed": self.committed,
+                "released": self.released,
+                "expired": self.expired,
+            }
+
+@lru_cache(maxsize=1)
+def get_reservations() -> Reservations:
+    """
+    The shared reservations, for stock in get_inventory(). They are held
+    for RESERVATION_TTL seconds, and swept every RESERVATION_SWEEP_INTERVAL
+    seconds. Since the stock only changes through them, the reorder
+    pipeline is started with them.
+    """
+    get_reorder_pipeline()
+    reservations = Reservations(get_inventory())
+    reservations.start_sweeper()
+    return reservations
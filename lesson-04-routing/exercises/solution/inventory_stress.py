@@ -0,0 +1,138 @@
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+
+from agents.inventory_store import MemoryInventory, SQLiteInventory
+from agents.reservations import Reservations
+
+# Checks that stock is never sold twice when many sessions reserve it at
+# the same time.
+#
+# For each kind of inventory, it checks that:
+#   - when --threads threads all try to reserve the last --stock units of a
+#     product, exactly --stock reservations are made and the count ends at 0
+#   - when the threads reserve, commit and release at random, what is left
+#     in stock plus what was committed is what there was to start with
+#   - when reservations run out while other threads try to commit them,
+#     each one is either committed or put back by the sweeper, never both
+#
+# Run it from this directory: python inventory_stress.py
+
+PRODUCT = "P001"
+
+def run_threads(count: int, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def last_units(make_inventory, threads: int, stock: int) -> list[str]:
+    inventory = make_inventory(stock)
+    reservations = Reservations(inventory)
+    made = [0] * threads
+
+    def grab(index):
+        while reservations.reserve(PRODUCT, 1) is not None:
+            made[index] += 1
+
+    run_threads(threads, grab)
+    problems = []
+    if sum(made) != stock:
+        problems.append(f"{sum(made)} reservations made for {stock} units")
+    if inventory.count(PRODUCT) != 0:
+        problems.append(f"{inventory.count(PRODUCT)} left in stock instead of 0")
+    return problems
+
+def random_use(make_inventory, threads: int, stock: int) -> list[str]:
+    inventory = make_inventory(stock)
+    reservations = Reservations(inventory)
+    committed = [0] * threads
+
+    def shop(index):
+        rng = random.Random(index)
+        for _ in range(stock // threads):
+            quantity = rng.randint(1, 3)
+            reservation_id = reservations.reserve(PRODUCT, quantity)
+            if reservation_id is None:
+                continue
+            if rng.random() < 0.5 and reservations.commit(reservation_id):
+                committed[index] += quantity
+            else:
+                reservations.release(reservation_id)
+
+    run_threads(threads, shop)
+    left = inventory.count(PRODUCT)
+    if left + sum(committed) != stock:
+        return [f"{left} left and {sum(committed)} committed from {stock}"]
+    return []
+
+def commit_or_expire(make_inventory, threads: int, stock: int) -> list[str]:
+    inventory = make_inventory(stock)
+    reservations = Reservations(inventory, ttl=0.005)
+    reservations.start_sweeper(0.001)
+    committed = [0] * threads
+
+    def shop(index):
+        for _ in range(stock // threads):
+            reservation_id = reservations.reserve(PRODUCT, 1)
+            if reservation_id is None:
+                continue
+            # Sometimes in time, sometimes after the sweeper got to it
+            time.sleep(random.random() * 0.01)
+            committed[index] += reservations.commit(reservation_id)
+
+    run_threads(threads, shop)
+    time.sleep(0.05)
+    reservations.stop()
+    left = inventory.count(PRODUCT)
+    stats = reservations.stats()
+    problems = []
+    if left + sum(committed) != stock:
+        problems.append(f"{left} left and {sum(committed)} committed from {stock}")
+    if not sum(committed):
+        problems.append("nothing was committed")
+    if stats["held"] or not stats["expired"]:
+        problems.append(f"{stats['held']} still held and {stats['expired']} expired")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress inventory reservations from many threads.")
+    parser.add_argument("--threads", type=int, default=16, help="Number of threads.")
+    parser.add_argument("--stock", type=int, default=2000, help="Units of the product in stock.")
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        paths = itertools.count()
+        kinds = {
+            "memory": lambda stock: MemoryInventory({PRODUCT: stock}),
+            "sqlite": lambda stock: SQLiteInventory(os.path.join(directory, f"inventory-{next(paths)}.db"), {PRODUCT: stock}),
+        }
+        for kind, make_inventory in kinds.items():
+            for check in [last_units, random_use, commit_or_expire]:
+                start = time.perf_counter()
+                problems = check(make_inventory, args.threads, args.stock)
+                elapsed = time.perf_counter() - start
+                print(f"{kind:8} {check.__name__:18} {elapsed:6.2f}s  " + ("ok" if not problems else "FAILED: " + "; ".join(problems)))
+                ok = ok and not problems
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
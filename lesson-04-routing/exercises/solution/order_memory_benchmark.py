@@ -0,0 +1,89 @@
+import argparse
+import gc
+import random
+import tracemalloc
+from collections import Counter
+
+from agents.order_data import Order, OrderStatus
+from agents.products import products
+
+# Compares the memory used to keep open orders as Order objects with the
+# memory used to keep them as dicts, the way they used to be kept.
+#
+# It makes --orders random carts, each with up to --max-items things in it,
+# picked from the catalog so that some products are bought more than once.
+# About a tenth of the orders are placed and given an address. The same
+# orders are then built in both layouts, and the memory each layout takes
+# is measured with tracemalloc. The product IDs and the addresses are
+# shared by both, and the order IDs are left out, so only what each layout
+# adds is counted. It also checks that every Order turns back into the
+# same cart that its dict holds.
+#
+# Run it from this directory: python order_memory_benchmark.py
+
+ADDRESS = {"name": "Jane Doe", "address_1": "12 Third St", "city": "Forth", "state": "NY", "postal_code": "56789"}
+
+def make_carts(count: int, max_items: int, seed: int) -> list[tuple[list[str], bool]]:
+    rng = random.Random(seed)
+    product_ids = list(products)
+    return [
+        (rng.choices(product_ids, k=rng.randint(0, max_items)), rng.random() < 0.1)
+        for _ in range(count)
+    ]
+
+def dict_order(cart: list[str], placed: bool) -> dict:
+    return {
+        "cart": list(cart),
+        "address": ADDRESS if placed else None,
+        "order_status": OrderStatus.PLACED if placed else None,
+    }
+
+def slotted_order(cart: list[str], placed: bool) -> Order:
+    order = Order()
+    for product_id, quantity in Counter(cart).items():
+        order.add(product_id, quantity)
+    if placed:
+        order.address = ADDRESS
+        order.order_status = OrderStatus.PLACED
+    return order
+
+def measure(build, carts: list) -> tuple[int, list]:
+    """Builds an order for every cart, returning the bytes used and the orders."""
+    # The list holding the orders is made first, so only the orders are counted
+    orders = [None] * len(carts)
+    gc.collect()
+    tracemalloc.start()
+    for i, (cart, placed) in enumerate(carts):
+        orders[i] = build(cart, placed)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used, orders
+
+def check(dict_orders: list, slotted_orders: list) -> bool:
+    for order, slotted in zip(dict_orders, slotted_orders):
+        cart = slotted.to_dict()["cart"]
+        if {item["product_id"]: item["quantity"] for item in cart} != Counter(order["cart"]):
+            print(f"The Order's cart {cart} doesn't match {order['cart']}")
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory used by Order objects and order dicts.")
+    parser.add_argument("--orders", type=int, default=200000, help="Number of open orders.")
+    parser.add_argument("--max-items", type=int, default=12, help="Most things in one cart.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the random carts.")
+    args = parser.parse_args()
+
+    carts = make_carts(args.orders, args.max_items, args.seed)
+    dict_bytes, dict_orders = measure(dict_order, carts)
+    slotted_bytes, slotted_orders = measure(slotted_order, carts)
+
+    items = sum(len(cart) for cart, _ in carts)
+    print(f"{args.orders:,} orders, {items:,} things in their carts")
+    for label, used in [("dict", dict_bytes), ("Order", slotted_bytes)]:
+        print(f"{label:6} {used / 2**20:8.1f} MiB {used / args.orders:8.1f} bytes per order")
+    print(f"Order uses {slotted_bytes / dict_bytes:.0%} of the memory of the dicts")
+    raise SystemExit(0 if check(dict_orders, slotted_orders) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from agents.cart import add_to_cart, get_order, place_order
+from agents.inventory_store import get_inventory
+from agents.order_store import OrderIds, claim_worker_id, get_order_store, release_worker_id
+from agents.products import products
+from agents.reorders import get_reorder_pipeline, get_reorder_records
+from agents.reservations import get_reservations
+
+# Checks that the order tools stay correct when many sessions use them at
+# the same time.
+#
+# For each kind of order store, --threads threads each create --orders new
+# orders with get_order(), add --items products to each of them, and place
+# them with place_order(). At the same time, every thread also adds to one
+# order that all of them share. The script then checks that no order ID was
+# handed out twice, that no item added to a cart was lost, and that every
+# order was placed with a subtotal that matches its cart. It also checks
+# that OrderIds with different worker numbers, used from several threads,
+# never make the same ID, and that workers claiming their numbers in the
+# same SQLite file at the same time never get the same one.
+#
+# Run it from this directory: python order_store_stress.py
+
+ADDRESS = {"name": "Jane Doe", "address_1": "12 Third St", "city": "Forth", "state": "NY", "postal_code": "56789"}
+PRODUCTS = ["P001", "P002", "P004", "P005"]
+
+def run_threads(count: int, target) -> float:
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+def cart_count(order: dict) -> int:
+    return sum(item["quantity"] for item in order["cart"])
+
+def cart_price(order: dict) -> float:
+    return round(sum(products[item["product_id"]]["price"] * item["quantity"] for item in order["cart"]), 2)
+
+def reset_stores():
+    if get_reservations.cache_info().currsize:
+        get_reservations().stop()
+    if get_reorder_pipeline.cache_info().currsize:
+        get_reorder_pipeline().stop()
+    for cached in [get_order_store, get_inventory, get_reservations, get_reorder_pipeline, get_reorder_records]:
+        cached.cache_clear()
+
+def stress_store(label: str, threads: int, orders: int, items: int) -> bool:
+    reset_stores()
+    # Enough stock that no order runs out
+    for product_id in PRODUCTS:
+        get_inventory().put_back(product_id, 2 * threads * orders * items)
+    shared_id = get_order()["order_id"]
+    created = [[] for _ in range(threads)]
+
+    def session(index):
+        for i in range(orders):
+            order_id = get_order()["order_id"]
+            created[index].append(order_id)
+            for j in range(items):
+                add_to_cart(order_id, PRODUCTS[j % len(PRODUCTS)])
+                add_to_cart(shared_id, PRODUCTS[index % len(PRODUCTS)])
+            place_order(order_id, ADDRESS)
+
+    elapsed = run_threads(threads, session)
+
+    order_ids = [order_id for ids in created for order_id in ids]
+    problems = []
+    if len(set(order_ids)) != len(order_ids):
+        problems.append(f"{len(order_ids) - len(set(order_ids))} duplicate order IDs")
+    for order_id in order_ids:
+        order = get_order(order_id)["order"]
+        if cart_count(order) != items or order["order_status"] is None:
+            problems.append(f"{order_id} has {cart_count(order)} items and status {order['order_status']}")
+            break
+        if order["subtotal"] != cart_price(order):
+            problems.append(f"{order_id} has a subtotal of {order['subtotal']} for a cart costing {cart_price(order)}")
+            break
+    shared = get_order(shared_id)["order"]
+    shared_items = cart_count(shared)
+    if shared_items != threads * orders * items:
+        problems.append(f"the shared cart has {shared_items} items instead of {threads * orders * items}")
+    if shared["subtotal"] != cart_price(shared):
+        problems.append(f"the shared cart has a subtotal of {shared['subtotal']} for a cart costing {cart_price(shared)}")
+
+    calls = len(order_ids) * (2 + 2 * items)
+    print(f"{label:8} {len(order_ids):>7,} orders {calls:>9,} calls {elapsed:7.2f}s {calls / elapsed:>10,.0f} calls/s  "
+          + ("ok" if not problems else "FAILED: " + "; ".join(problems)))
+    return not problems
+
+def stress_ids(threads: int, count: int) -> bool:
+    made = [[] for _ in range(threads)]
+    workers = [OrderIds(worker_id) for worker_id in (1, 2)]
+
+    def make(index):
+        ids = workers[index % len(workers)]
+        made[index] = [ids.next_id() for _ in range(count)]
+
+    run_threads(threads, make)
+    all_ids = [order_id for ids in made for order_id in ids]
+    duplicates = len(all_ids) - len(set(all_ids))
+    print(f"{'ids':8} {len(all_ids):>7,} IDs from 2 workers, {duplicates} duplicates")
+    return duplicates == 0
+
+def stress_worker_claims(path: str, threads: int) -> bool:
+    claimed = [None] * threads
+
+    def claim(index):
+        claimed[index] = claim_worker_id(path)
+
+    run_threads(threads, claim)
+    problems = []
+    if len(set(claimed)) != threads:
+        problems.append(f"{threads - len(set(claimed))} worker numbers claimed twice")
+    try:
+        claim_worker_id(path, claimed[0])
+        problems.append(f"worker number {claimed[0]} was claimed again")
+    except ValueError:
+        pass
+    for worker_id in claimed:
+        release_worker_id(path, worker_id)
+    print(f"{'workers':8} {threads:>7,} worker numbers claimed  " + ("ok" if not problems else "FAILED: " + "; ".join(problems)))
+    return not problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the order store from many threads.")
+    parser.add_argument("--threads", type=int, default=16, help="Number of threads.")
+    parser.add_argument("--orders", type=int, default=50, help="Orders each thread creates.")
+    parser.add_argument("--items", type=int, default=5, help="Items added to each order.")
+    args = parser.parse_args()
+
+    ok = stress_ids(args.threads, 20000)
+    with tempfile.TemporaryDirectory() as directory:
+        ok = stress_worker_claims(os.path.join(directory, "workers.db"), args.threads) and ok
+        for kind in ["memory", "sqlite"]:
+            os.environ["ORDER_STORE"] = kind
+            os.environ["ORDER_STORE_PATH"] = os.path.join(directory, "orders.db")
+            os.environ["INVENTORY_STORE_PATH"] = os.path.join(directory, "inventory.db")
+            ok = stress_store(kind, args.threads, args.orders, args.items) and ok
+    reset_stores()
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from agents.inventory_store import MemoryInventory, SQLiteInventory
+from agents.reorders import MemoryReorderRecords, ReorderPipeline, SQLiteReorderRecords
+from agents.reservations import Reservations
+
+# Checks that the reorder pipeline notices every product that runs low,
+# without slowing down the sessions that sell them.
+#
+# For each kind of inventory, --threads threads reserve and commit or
+# release products at random, which takes some of them below their reorder
+# thresholds and leaves others above them. Once the pipeline has handled
+# every change, the script checks that each product below its threshold
+# has exactly one reorder and that no other product has one. It prints how
+# many changes the pipeline handled, in how many batches, and how long a
+# reservation took with and without the pipeline watching the inventory.
+#
+# Run it from this directory: python reorder_pipeline_check.py
+
+STOCK = {"P001": 400, "P002": 400, "P004": 400, "P005": 400, "P006": 4000, "P007": 4000}
+THRESHOLDS = {"P001": 100, "P002": 100, "P004": 50, "P005": 50, "P006": 100, "P007": 100}
+
+def run_threads(count: int, target) -> float:
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+def shop(inventory, threads: int, rounds: int) -> float:
+    """Reserves at random from every thread, returning the seconds per reservation."""
+    reservations = Reservations(inventory)
+
+    def session(index):
+        rng = random.Random(index)
+        for _ in range(rounds):
+            reservation_id = reservations.reserve(rng.choice(list(STOCK)), 1)
+            if reservation_id is not None and not (rng.random() < 0.3 and reservations.commit(reservation_id)):
+                reservations.release(reservation_id)
+
+    return run_threads(threads, session) / (threads * rounds)
+
+def check(label: str, make_inventory, make_records, threads: int, rounds: int) -> bool:
+    plain = shop(make_inventory(), threads, rounds)
+
+    inventory = make_inventory()
+    records = make_records()
+    pipeline = ReorderPipeline(records, THRESHOLDS, batch_seconds=0.05)
+    pipeline.start()
+    pipeline.watch(inventory)
+    watched = shop(inventory, threads, rounds)
+    pipeline.flush(timeout=30)
+    pipeline.stop()
+
+    problems = []
+    for product_id, threshold in THRESHOLDS.items():
+        count = inventory.count(product_id)
+        reorder = records.get(product_id)
+        if count < threshold and reorder is None:
+            problems.append(f"{product_id} is down to {count} with no reorder")
+        if reorder is not None and reorder["count"] >= threshold:
+            problems.append(f"{product_id} was reordered at {reorder['count']}")
+    stats = pipeline.stats()
+    if stats["reorders"] != sum(records.get(product_id) is not None for product_id in THRESHOLDS):
+        problems.append(f"{stats['reorders']} reorders written")
+
+    print(f"{label:8} {stats['events']:>7,} changes in {stats['batches']:>3} batches, {stats['reorders']} reorders, "
+          f"{plain * 1e6:6.1f}us per reservation without the pipeline, {watched * 1e6:6.1f}us with it  "
+          + ("ok" if not problems else "FAILED: " + "; ".join(problems)))
+    return not problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the reorder pipeline under load.")
+    parser.add_argument("--threads", type=int, default=16, help="Number of threads.")
+    parser.add_argument("--rounds", type=int, default=2000, help="Reservations each thread makes.")
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        def sqlite_path(name):
+            return os.path.join(directory, f"{name}-{time.perf_counter_ns()}.db")
+
+        ok = check("memory", lambda: MemoryInventory(STOCK), MemoryReorderRecords,
+                   args.threads, args.rounds) and ok
+        ok = check("sqlite", lambda: SQLiteInventory(sqlite_path("inventory"), STOCK),
+                   lambda: SQLiteReorderRecords(sqlite_path("reorders")), args.threads, args.rounds // 4) and ok
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -48,6 +48,9 @@ class InventoryData(BaseModel):
     count: int = Field(description="The quantity available.")
     reorder_status: Optional[str] = Field(description="The reorder status of the product.", default=None)
 
+# The session state key that the check_inventory_agent saves its output under
+INVENTORY_DATA_KEY = "inventory_data"
+
 inventory_instruction = read_prompt("inventory-prompt.txt")
 reorder_instruction = "Check the reorder status for the given product ID using the check_reorder_status tool."
 
@@ -66,7 +69,8 @@ check_inventory_agent = LlmAgent(
     model=model,
     instruction="Check the inventory for the given product ID and return the details.",
     tools=[check_inventory],
-    output_schema=InventoryData
+    output_schema=InventoryData,
+    output_key=INVENTORY_DATA_KEY,
 )
 
 # TODO: Create the reorder_agent
@@ -79,7 +83,8 @@ class PossiblyReorderAgent(BaseAgent):
         self.reorder_agent = reorder_agent
 
     async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
-        # TODO: Implement the logic to inspect the previous agent's output
+        # TODO: Read the previous agent's output from the session state
+        # under INVENTORY_DATA_KEY
 
         # TODO: If count < 5, run the reorder_agent
         
@@ -9,7 +9,8 @@ class OrderStatus(Enum):
 
 # Shared dictionary
 # Key: order_id (str or int)
-# Value: dict with keys 'cart', 'address', 'order_status'
+# Value: dict with keys 'cart', 'address', 'order_status', and 'shipping_type'
+# once the order has been placed
 orders = {
     "1001": {
         "cart": ["P001", "P002"],
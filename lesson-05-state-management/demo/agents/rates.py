@@ -7,6 +7,9 @@ SHIPPING_RATES = {
     "free": 0.00
 }
 
+# Orders with a subtotal of at least this much ship for free
+FREE_SHIPPING_THRESHOLD = 100.00
+
 TAX_RATES = {
     "CA": 0.075,  # California
     "NY": 0.08,
@@ -1,11 +1,13 @@
 import os
+import json
 from pydantic import BaseModel, Field
 from typing import Optional, AsyncGenerator
-from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LlmAgent, InvocationContext, BaseAgent
-from google.adk.events import Event
+from google.adk.agents import Agent, SequentialAgent, LlmAgent, InvocationContext, BaseAgent
+from google.adk.events import Event, EventActions
 from google.adk.tools.tool_context import ToolContext
+from google.genai import types
 from .order_data import orders, OrderStatus
-from .rates import SHIPPING_RATES, TAX_RATES
+from .rates import SHIPPING_RATES, TAX_RATES, FREE_SHIPPING_THRESHOLD
 from .products import products
 
 model = "gemini-2.5-flash"
@@ -49,13 +51,14 @@ class PlaceOrderOutput(BaseModel):
 
 # --- Tools ---
 
-def place_order(order_id: str, address: dict, tool_context: ToolContext ):
+def place_order(order_id: str, address: dict, tool_context: ToolContext, shipping_type: str = "standard"):
     """Places an order by adding the shipping address and setting status to PLACED.
     Also saves the order being worked on in the session state
 
     Args:
         order_id: The ID of the order.
         address: Dictionary with name, address_1, address_2, city, state, postal_code.
+        shipping_type: The type of shipping (e.g., "standard", "express"). Defaults to "standard".
     """
     if order_id not in orders:
         return {"error": "Order ID not found"}
@@ -66,7 +69,11 @@ def place_order(order_id: str, address: dict, tool_context: ToolContext ):
         return {"error": "Order already has a status set"}
 
     order["address"] = address
+    # Kept on the order too, so it can be priced again later without the session
+    order["shipping_type"] = shipping_type
     tool_context.state["order"] = order
+    tool_context.state["order_id"] = order_id
+    tool_context.state["shipping_type"] = shipping_type
 
     return {
         "cart": order.get("cart"),
@@ -165,80 +172,64 @@ def approve_order(order_id: str) -> dict:
 
 # --- Sub-Agents --- 
 
-shipping_cost_agent = LlmAgent(
-    name="shipping_cost_agent",
-    description="Calculates the shipping cost for an order.",
-    model=model,
-    instruction=read_prompt("shipping-cost-prompt.txt"),
-    tools=[calculate_shipping_cost],
-    output_schema=ShippingCostOutput,
-)
-
-free_shipping_agent = LlmAgent(
-    name="free_shipping_agent",
-    description="Calculates shipping cost for free shipping eligible orders.",
-    model=model,
-    instruction=read_prompt("free-shipping-prompt.txt"),
-    tools=[calculate_shipping_cost],
-    output_schema=ShippingCostOutput,
-)
-
-class ShippingRouter(BaseAgent):
+class OrderCostingAgent(BaseAgent):
+    """
+    Computes the shipping cost, taxes and total for the order saved in the
+    session state, without calling the model. Orders at or above
+    free_threshold ship for free.
+    """
 
     free_threshold: float
-    free_agent: Agent
-    standard_agent: Agent
 
-    def __init__(self, name: str, free_agent: Agent, standard_agent: Agent, free_threshold: float):
+    def __init__(self, name: str, free_threshold: float, description: str = ""):
       super().__init__(
           name=name,
+          description=description,
           free_threshold=free_threshold,
-          free_agent=free_agent,
-          standard_agent=standard_agent,
       )
 
-    async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
-      order = context.session.state.get("order")
-      subtotal = compute_subtotal(order)
-      is_free = subtotal >= self.free_threshold
-
-      if is_free:
-          subagent = self.free_agent
-      else:
-          subagent = self.standard_agent
+    def compute(self, order_id: str, order: dict, shipping_type: str) -> dict:
+      # Each result is checked against its schema before it is saved
+      if compute_subtotal(order) >= self.free_threshold:
+          shipping_type = "free"
+      shipping = ShippingCostOutput(**calculate_shipping_cost(order_id, shipping_type))
 
-      async for event in subagent.run_async(context):
-          yield event
+      address = order.get("address") or {}
+      taxes = TaxCostOutput(**calculate_taxes_cost(order_id, address.get("state", "")))
 
-shipping_router_agent = ShippingRouter(
-    name="shipping_router_agent",
-    free_agent=free_shipping_agent,
-    standard_agent=shipping_cost_agent,
-    free_threshold=100.00,
-)
+      order_cost = ComputeOrderOutput(**compute_order_cost(order_id, shipping.shipping_cost, taxes.tax_amount))
+      return {
+          "shipping": shipping.model_dump(),
+          "taxes": taxes.model_dump(),
+          "order_cost": order_cost.model_dump(),
+      }
 
-taxes_cost_agent = LlmAgent(
-    name="taxes_cost_agent",
-    description="Calculates the tax amount for an order based on the destination state.",
-    model=model,
-    instruction=read_prompt("taxes-cost-prompt.txt"),
-    tools=[calculate_taxes_cost],
-    output_schema=TaxCostOutput,
-)
+    async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
+      order_id = context.session.state.get("order_id")
+      order = context.session.state.get("order")
+      shipping_type = context.session.state.get("shipping_type") or "standard"
 
-costs_agent = ParallelAgent(
-    name="other_costs_agent",
-    description="Calculates shipping and taxes in parallel.",
-    sub_agents=[shipping_router_agent, taxes_cost_agent],
-)
+      if order is None or order_id not in orders:
+          result = {"error": f"Order {order_id} has not been placed."}
+          state_delta = {}
+      else:
+          state_delta = self.compute(order_id, order, shipping_type)
+          result = state_delta["order_cost"]
+
+      # Save the results in the session state, and add them to the
+      # conversation so the summary agent can present them
+      yield Event(
+          author=self.name,
+          invocation_id=context.invocation_id,
+          branch=context.branch,
+          content=types.Content(role="model", parts=[types.Part(text=json.dumps(result))]),
+          actions=EventActions(state_delta=state_delta),
+      )
 
-compute_order_agent = LlmAgent(
-    name="compute_order_agent",
-    description="Combines shipping and tax costs to compute the order total.",
-    model=model,
-    instruction=read_prompt("compute-order-prompt.txt"),
-    tools=[compute_order_cost],
-    output_schema=ComputeOrderOutput,
+order_costing_agent = OrderCostingAgent(
+    name="order_costing_agent",
+    description="Calculates shipping, taxes and the total cost for an order.",
+    free_threshold=FREE_SHIPPING_THRESHOLD,
 )
 
 place_order_agent = LlmAgent(
@@ -275,8 +266,7 @@ fulfillment_workflow_agent = SequentialAgent(
     description="Calculates costs after an order is placed.",
     sub_agents=[
         place_order_agent,
-        costs_agent,
-        compute_order_agent,
+        order_costing_agent,
         order_summary_agent,
     ],
 )
@@ -0,0 +1,92 @@
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from agents.order_data import orders
+from agents.products import products
+from agents.rates import FREE_SHIPPING_THRESHOLD, TAX_RATES
+from agents.pricing import PriceTable, price_order_arrays, price_orders
+from agents.shipping import calculate_shipping_cost, calculate_taxes_cost, compute_order_cost, compute_subtotal, place_order
+
+# Compares pricing orders one at a time, with the functions the shipping
+# agents use, against pricing them all at once with price_orders().
+#
+# Generates --orders random orders and places them with the place_order
+# tool, prices them both ways --repeat times, checks that both give the
+# same amounts, and prints the best time of each.
+# Run it from this directory: python pricing_benchmark.py
+
+def generate_orders(count: int, seed: int = 5) -> list[str]:
+    rng = random.Random(seed)
+    product_ids = list(products)
+    states = [state for state in TAX_RATES if state != "default"] + ["WA", "OR"]
+    order_ids = []
+    for i in range(count):
+        order_id = f"bench-{i}"
+        orders[order_id] = {"cart": rng.choices(product_ids, k=rng.randint(1, 8))}
+        # The tool only uses the session state of its tool context
+        result = place_order(
+            order_id,
+            {"state": rng.choice(states)},
+            SimpleNamespace(state={}),
+            shipping_type=rng.choice(["standard", "standard", "express", "international"]),
+        )
+        if "error" in result:
+            raise RuntimeError(f"Could not place {order_id}: {result['error']}")
+        order_ids.append(order_id)
+    return order_ids
+
+def price_one_by_one(order_ids: list[str]) -> list[dict]:
+    results = []
+    for order_id in order_ids:
+        order = orders[order_id]
+        shipping_type = order["shipping_type"]
+        if compute_subtotal(order) >= FREE_SHIPPING_THRESHOLD:
+            shipping_type = "free"
+        shipping = calculate_shipping_cost(order_id, shipping_type)
+        taxes = calculate_taxes_cost(order_id, order["address"]["state"])
+        results.append(compute_order_cost(order_id, shipping["shipping_cost"], taxes["tax_amount"]))
+    return results
+
+def best_time(function, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch order pricing.")
+    parser.add_argument("--orders", type=int, default=10000, help="Number of orders to price.")
+    parser.add_argument("--repeat", type=int, default=5, help="Times to price them, keeping the best.")
+    args = parser.parse_args()
+
+    order_ids = generate_orders(args.orders)
+    try:
+        keys = ["subtotal", "shipping_cost", "tax_amount", "total_cost"]
+        one_by_one = price_one_by_one(order_ids)
+        batch = price_orders(order_ids)
+        mismatches = sum(
+            1 for a, b in zip(one_by_one, batch)
+            if [a[key] for key in keys] != [b[key] for key in keys]
+        )
+
+        single_time = best_time(lambda: price_one_by_one(order_ids), args.repeat)
+        batch_time = best_time(lambda: price_orders(order_ids), args.repeat)
+        price_table = PriceTable(products)
+        arrays_time = best_time(lambda: price_order_arrays(order_ids, price_table), args.repeat)
+    finally:
+        for order_id in order_ids:
+            orders.pop(order_id, None)
+
+    print(f"Priced {args.orders:,} orders, best of {args.repeat}")
+    print(f"  one at a time               {single_time * 1000:10.1f} ms")
+    print(f"  price_orders                {batch_time * 1000:10.1f} ms  ({single_time / batch_time:.1f}x)")
+    print(f"  price_order_arrays          {arrays_time * 1000:10.1f} ms  ({single_time / arrays_time:.1f}x)")
+    print(f"Orders with different amounts: {mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+
+# An inverted index of the product catalog, so searching doesn't need to
+# scan every product.
+#
+# Each word in a product's name and description maps to the set of product
+# IDs that contain it (its posting list). A second set of posting lists
+# covers only the names, which is used for ranking. The words are kept in a
+# sorted list, so a query word can match every indexed word it is a prefix
+# of ("head" matches "headphones") with a binary search. Words shorter than
+# MIN_PREFIX only match themselves, so the "c" in "usb-c" doesn't match every
+# word starting with c. When many products are indexed at once, the new
+# words are collected and the list is sorted once at the end, rather than
+# inserting each word into it.
+#
+# ProductCatalog is a dict that keeps its index up to date as products are
+# added, replaced or removed. Editing a product's dict in place isn't seen,
+# so either assign the product again or call reindex() afterwards.
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Query words shorter than this must match a whole word
+MIN_PREFIX = 3
+
+# Matches in the name count for more than matches in the description
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def contains_phrase(tokens: list[str], phrase: list[str]) -> bool:
+    """
+    True if the phrase appears as consecutive tokens. The last word of the
+    phrase only needs to be the start of a token, so a partly typed word
+    still matches.
+    """
+    size = len(phrase)
+    for start in range(len(tokens) - size + 1):
+        if tokens[start:start + size - 1] == phrase[:-1] and tokens[start + size - 1].startswith(phrase[-1]):
+            return True
+    return False
+
+class ProductIndex:
+
+    def __init__(self):
+        self.postings = {}
+        self.name_postings = {}
+        self.terms = []
+        self.fields = {}
+        self.lock = threading.RLock()
+
+    def add(self, product_id: str, product: dict):
+        self.add_many({product_id: product})
+
+    def add_many(self, products: dict):
+        """Indexes several products, keyed by product ID."""
+        with self.lock:
+            new_terms = set()
+            for product_id, product in products.items():
+                self.remove(product_id)
+                name_tokens = tokenize(product.get("name", ""))
+                description_tokens = tokenize(product.get("description", ""))
+                self.fields[product_id] = (name_tokens, description_tokens)
+                for token in set(name_tokens + description_tokens):
+                    posting = self.postings.get(token)
+                    if posting is None:
+                        posting = self.postings[token] = set()
+                        new_terms.add(token)
+                    posting.add(product_id)
+                for token in set(name_tokens):
+                    self.name_postings.setdefault(token, set()).add(product_id)
+            if new_terms:
+                # The list is already sorted apart from the new words at
+                # the end, which sort() handles in close to linear time
+                self.terms.extend(new_terms)
+                self.terms.sort()
+
+    def remove(self, product_id: str):
+        with self.lock:
+            fields = self.fields.pop(product_id, None)
+            if fields is None:
+                return
+            name_tokens, description_tokens = fields
+            for token in set(name_tokens + description_tokens):
+                posting = self.postings[token]
+                posting.discard(product_id)
+                if not posting:
+                    del self.postings[token]
+                    del self.terms[bisect.bisect_left(self.terms, token)]
+            for token in set(name_tokens):
+                posting = self.name_postings[token]
+                posting.discard(product_id)
+                if not posting:
+                    del self.name_postings[token]
+
+    def clear(self):
+        with self.lock:
+            self.postings.clear()
+            self.name_postings.clear()
+            self.terms.clear()
+            self.fields.clear()
+
+    def lookup(self, word: str, postings: dict = None) -> set[str]:
+        """
+        The IDs of products with a word that starts with this one, or that
+        is this one if it is shorter than MIN_PREFIX.
+        """
+        if postings is None:
+            postings = self.postings
+        if len(word) < MIN_PREFIX:
+            return set(postings.get(word, ()))
+        matches = set()
+        start = bisect.bisect_left(self.terms, word)
+        # islice walks the list from start without copying the rest of it
+        for term in itertools.islice(self.terms, start, None):
+            if not term.startswith(word):
+                break
+            matches |= postings.get(term, set())
+        return matches
+
+    def search_phrase(self, query: str, limit: int = None) -> list[str]:
+        """
+        Products whose name or description contains the query as a phrase.
+        Name matches are ranked ahead of description matches.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self.lock:
+            # Intersect the posting lists, smallest first, to get the
+            # products that have every word, then check the word order.
+            # Only the last word of the phrase may be a partial word.
+            postings = [self.postings.get(word, set()) for word in words[:-1]]
+            postings.append(self.lookup(words[-1]))
+            postings.sort(key=len)
+            candidates = set.intersection(*postings)
+            ranked = []
+            for product_id in candidates:
+                name_tokens, description_tokens = self.fields[product_id]
+                if contains_phrase(name_tokens, words):
+                    ranked.append((0, product_id))
+                elif contains_phrase(description_tokens, words):
+                    ranked.append((1, product_id))
+        ranked.sort()
+        return [product_id for _, product_id in ranked[:limit]]
+
+    def search_any(self, query: str, limit: int = None) -> list[str]:
+        """
+        Products matching any word of the query, ranked by how many words
+        they match and whether they match in the name.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        scores = {}
+        with self.lock:
+            for word in words:
+                name_matches = self.lookup(word, self.name_postings)
+                for product_id in name_matches:
+                    scores[product_id] = scores.get(product_id, 0) + NAME_WEIGHT
+                for product_id in self.lookup(word) - name_matches:
+                    scores[product_id] = scores.get(product_id, 0) + DESCRIPTION_WEIGHT
+        ranking = [(-score, product_id) for product_id, score in scores.items()]
+        if limit is None:
+            ranking.sort()
+        else:
+            ranking = heapq.nsmallest(limit, ranking)
+        return [product_id for _, product_id in ranking]
+
+class ProductCatalog(dict):
+    """A dict of products, keyed by product ID, with an inverted index."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.index = ProductIndex()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, product_id, product):
+        super().__setitem__(product_id, product)
+        self.index.add(product_id, product)
+
+    def __delitem__(self, product_id):
+        super().__delitem__(product_id)
+        self.index.remove(product_id)
+
+    def update(self, *args, **kwargs):
+        products = dict(*args, **kwargs)
+        super().update(products)
+        self.index.add_many(products)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, product_id, product=None):
+        if product_id not in self:
+            self[product_id] = product
+        return self[product_id]
+
+    def pop(self, product_id, *default):
+        product = super().pop(product_id, *default)
+        self.index.remove(product_id)
+        return product
+
+    def popitem(self):
+        product_id, product = super().popitem()
+        self.index.remove(product_id)
+        return product_id, product
+
+    def clear(self):
+        super().clear()
+        self.index.clear()
+
+    def reindex(self, product_id: str = None):
+        """Update the index after a product's dict was changed in place."""
+        if product_id is None:
+            self.index.clear()
+            self.index.add_many(self)
+        else:
+            self.index.add(product_id, self[product_id])
@@ -1,7 +1,10 @@
+from .product_index import ProductCatalog
+
 # Shared dictionary for product catalog
 # Key: product_id
 # Value: dict with name, description, price
-products = {
+# The catalog keeps a search index up to date as products change.
+products = ProductCatalog({
     "P001": {
         "name": "Wireless Headphones",
         "description": "Noise cancelling over-ear headphones",
@@ -72,7 +75,7 @@ products = {
         "description": "Dual monitor desk mount stand",
         "price": 39.99,
     }
-}
+})
 
 # Shared dictionary for inventory counts
 # Key: product_id
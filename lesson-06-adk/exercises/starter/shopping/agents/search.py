@@ -13,35 +13,27 @@ def read_prompt(filename):
     with open(file_path, "r") as f:
         return f.read()
 
-def search_products(query: str):
+def product_summary(product_id: str) -> dict:
+    pdata = products[product_id]
+    return {"id": product_id, "name": pdata["name"], "price": pdata["price"]}
+
+def search_products(query: str, limit: int = 10):
     """Searches for products by name or description.
 
     Args:
         query: The search query string.
+        limit: The maximum number of products to return.
     """
-    results = []
-    for pid, pdata in products.items():
-        if query.lower() in pdata["name"].lower() or query.lower() in pdata["description"].lower():
-            results.append({"id": pid, "name": pdata["name"], "price": pdata["price"]})
-    return results
+    return [product_summary(pid) for pid in products.index.search_phrase(query, limit)]
 
-def search_products_broad(query: str):
+def search_products_broad(query: str, limit: int = 10):
     """Searches for products matching any word in the query.
 
     Args:
         query: The search query string.
+        limit: The maximum number of products to return.
     """
-    results = []
-    words = query.lower().split()
-    for pid, pdata in products.items():
-        name_lower = pdata["name"].lower()
-        desc_lower = pdata["description"].lower()
-        
-        for word in words:
-            if word in name_lower or word in desc_lower:
-                results.append({"id": pid, "name": pdata["name"], "price": pdata["price"]})
-                break # Avoid duplicates if multiple words match
-    return results
+    return [product_summary(pid) for pid in products.index.search_any(query, limit)]
 
 search_instruction = read_prompt("search-prompt.txt")
 search_broad_instruction = read_prompt("search-broad-prompt.txt")
@@ -1,17 +1,10 @@
-import os
 from google.adk.agents import Agent
 from .agents.shipping import shipping_agent
 from .agents.inquiry import inquiry_agent
+from .agents.prompt_registry import read_prompt
 
 model = "gemini-2.5-flash"
 
-# Helper to read prompt
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 # Read instructions
 orchestrator_instruction = read_prompt("agent-prompt.txt")
 
@@ -0,0 +1,180 @@
+import logging
+import math
+import random
+import re
+import threading
+import zlib
+
+# Post-processing for search results before they are handed to the model.
+#
+# Search returns up to 10 chunks and many of them repeat each other: the
+# same legal notice is at the top of every policy PDF, and overlapping
+# chunks of one document share sentences. Every repeated word costs tokens
+# and latency without telling the model anything new, so this:
+#   1. drops chunks that are near-duplicates of an earlier chunk, using
+#      MinHash signatures of word shingles to estimate their similarity
+#   2. removes sentences that were already seen in an earlier chunk, so
+#      boilerplate is only sent once
+#   3. trims the results to a token budget, keeping the best ranked chunks
+# and keeps count of how many tokens this saved.
+
+SEGMENT_RE = re.compile(r"((?<=[.!?])\s+|\n+)")
+WORD_RE = re.compile(r"\w+")
+
+# Sentences shorter than this are headings or list markers, which are
+# expected to repeat, so they are never treated as boilerplate.
+MIN_BOILERPLATE_WORDS = 8
+
+# Don't keep a partial chunk with less room than this
+MIN_PARTIAL_TOKENS = 40
+
+# MinHash uses NUM_HASHES hash functions of the form (a * x + b) mod PRIME.
+# The coefficients are fixed so signatures are the same on every run.
+NUM_HASHES = 64
+PRIME = (1 << 61) - 1
+_random = random.Random(7)
+HASH_COEFFICIENTS = [
+    (_random.randrange(1, PRIME), _random.randrange(0, PRIME))
+    for _ in range(NUM_HASHES)
+]
+
+def estimate_tokens(text: str) -> int:
+    """A rough token count, using the usual four characters per token."""
+    return math.ceil(len(text) / 4)
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash(text: str) -> list[int]:
+    values = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)]
+    if not values:
+        return []
+    return [
+        min((a * value + b) % PRIME for value in values)
+        for a, b in HASH_COEFFICIENTS
+    ]
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def drop_near_duplicates(chunks: list[str], threshold: float) -> list[str]:
+    kept = []
+    signatures = []
+    for chunk in chunks:
+        signature = minhash(chunk)
+        if any(similarity(signature, other) >= threshold for other in signatures):
+            continue
+        kept.append(chunk)
+        signatures.append(signature)
+    return kept
+
+def strip_repeated_sentences(chunks: list[str]) -> list[str]:
+    seen = set()
+    stripped = []
+    for chunk in chunks:
+        # Split into sentences and lines, keeping the separators between them
+        pieces = SEGMENT_RE.split(chunk)
+        kept = []
+        for i in range(0, len(pieces), 2):
+            sentence = pieces[i]
+            separator = pieces[i + 1] if i + 1 < len(pieces) else ""
+            words = WORD_RE.findall(sentence.lower())
+            if len(words) >= MIN_BOILERPLATE_WORDS:
+                key = " ".join(words)
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence + separator)
+        text = "".join(kept).strip()
+        if text:
+            stripped.append(text)
+    return stripped
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    # Leave room for the " ..." that marks the text as cut short
+    cut = text[:max_tokens * 4 - 4]
+    if len(cut) < len(text) and " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + " ..."
+
+def apply_budget(chunks: list[str], token_budget: int) -> list[str]:
+    if token_budget <= 0:
+        return chunks
+    kept = []
+    remaining = token_budget
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk)
+        if tokens <= remaining:
+            kept.append(chunk)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_PARTIAL_TOKENS:
+            kept.append(truncate_to_tokens(chunk, remaining))
+        break
+    return kept
+
+class FilterStats:
+    """Running totals of what the filter removed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.chunks_in = 0
+        self.chunks_out = 0
+
+    def add(self, stats: dict):
+        with self.lock:
+            self.calls += 1
+            self.tokens_in += stats["tokens_in"]
+            self.tokens_out += stats["tokens_out"]
+            self.chunks_in += stats["chunks_in"]
+            self.chunks_out += stats["chunks_out"]
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": self.tokens_in - self.tokens_out,
+                "chunks_in": self.chunks_in,
+                "chunks_out": self.chunks_out,
+            }
+
+totals = FilterStats()
+
+def filter_chunks(
+    chunks: list[str],
+    token_budget: int = 2000,
+    duplicate_threshold: float = 0.8,
+) -> tuple[list[str], dict]:
+    """
+    Returns the filtered chunks and a dict describing what was removed.
+    A token_budget of 0 or less means no limit.
+    """
+    unique = drop_near_duplicates(chunks, duplicate_threshold)
+    stripped = strip_repeated_sentences(unique)
+    result = apply_budget(stripped, token_budget)
+
+    stats = {
+        "chunks_in": len(chunks),
+        "near_duplicates": len(chunks) - len(unique),
+        "chunks_out": len(result),
+        "tokens_in": sum(estimate_tokens(chunk) for chunk in chunks),
+        "tokens_out": sum(estimate_tokens(chunk) for chunk in result),
+    }
+    stats["tokens_saved"] = stats["tokens_in"] - stats["tokens_out"]
+    totals.add(stats)
+    logging.info(f"Search results filtered: {stats}")
+    return result, stats
+
+def filter_stats() -> dict:
+    return totals.as_dict()
@@ -1,30 +1,29 @@
 import os
 from google.adk.agents import Agent
-from toolbox_core import ToolboxSyncClient
-from .datastore import datastore_search_tool
+from .datastore import datastore_search_tool, warm_up
+from .prompt_registry import read_prompt
+from .toolbox_tools import get_connection
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 # --- Database Connection ---
 toolbox_url = os.environ.get("TOOLBOX_URL", "http://127.0.0.1:5000")
-print(f"Connecting to Toolbox at {toolbox_url}")
-db_client = ToolboxSyncClient(toolbox_url)
+db_client = get_connection(toolbox_url)
 
-get_order_tool = db_client.load_tool("get-order")
+get_order_tool = db_client.tool("get-order", cached=True, key="order_id")
 get_order_agent = Agent(
     name="get_order_agent",
     description="Handles questions about the status of orders",
     model=model,
     instruction=read_prompt("inquiry-order-prompt.txt"),
     tools=[get_order_tool],
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
 )
 
+# Set up the Vertex AI Search connection now instead of on the first question
+warm_up()
+
 policy_search_agent = Agent(
     name="datastore_search_agent",
     description="Handles questions about corporate store policies, including shipping policies",
@@ -0,0 +1,280 @@
+import array
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+# A local, offline stand-in for the Vertex AI Search datastore.
+#
+# The PDFs in the docs directory are split into overlapping chunks of text,
+# which are indexed for BM25 keyword ranking. Optionally, each chunk also
+# gets a small vector made by hashing its character trigrams, which helps
+# match misspelled or partial words the way Vertex AI's spell correction does.
+#
+# The index is written to disk once and then memory-mapped:
+#   meta.json    - the vocabulary, chunk lengths and a fingerprint of the PDFs
+#   chunks.json  - the text of each chunk
+#   postings.bin - (chunk, term frequency) pairs for each term, as uint32
+#   vectors.bin  - one float32 vector per chunk
+# It is rebuilt automatically when the PDFs change. Checking for changes
+# means listing the docs directory and looking at every PDF, so it is only
+# done when the index is first loaded and then every
+# DATASTORE_INDEX_CHECK_SECONDS (60 by default, 0 to never check again).
+# Searches in between use the loaded index without touching the disk.
+#
+# search() returns a list of chunk strings, the same as the Vertex AI search.
+
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 tuning parameters
+K1 = 1.2
+B = 0.75
+
+# Rank fusion constant used when combining BM25 and vector results
+RRF_K = 60
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def extract_pdf_text(path: str) -> str:
+    # pypdf is only needed to build the local index
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def chunk_text(text: str, chunk_words: int = 150, overlap: int = 30) -> list[str]:
+    """
+    Split a document into chunks of about chunk_words words, with overlap
+    words repeated between chunks. Chunks after the first start with the
+    document title so they still make sense on their own.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    title = lines[0]
+    words = " ".join(lines).split()
+
+    chunks = []
+    step = max(1, chunk_words - overlap)
+    for start in range(0, len(words), step):
+        chunk = " ".join(words[start:start + chunk_words])
+        if start > 0:
+            chunk = f"{title}\n{chunk}"
+        chunks.append(chunk)
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+def find_pdfs(docs_dir: str) -> list[str]:
+    paths = []
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                paths.append(os.path.join(root, name))
+    return paths
+
+def source_fingerprint(paths: list[str]) -> str:
+    """Changes whenever a PDF is added, removed or modified."""
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return f"{INDEX_VERSION}:{zlib.crc32(chr(0).join(parts).encode('utf-8')):08x}"
+
+def trigram_vector(text: str, dim: int) -> dict[int, float]:
+    """A sparse, normalized vector of hashed character trigrams."""
+    counts = {}
+    for word in tokenize(text):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            d = zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim
+            counts[d] = counts.get(d, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    if norm == 0:
+        return {}
+    return {d: v / norm for d, v in counts.items()}
+
+def write_file(path: str, data: bytes):
+    # Write to a temporary file first so readers never see half an index
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def build_index(docs_dir: str, index_dir: str, vector_dim: int = 256) -> dict:
+    paths = find_pdfs(docs_dir)
+    chunks = []
+    sources = []
+    for path in paths:
+        for chunk in chunk_text(extract_pdf_text(path)):
+            chunks.append(chunk)
+            sources.append(os.path.relpath(path, docs_dir))
+
+    # term -> list of (chunk id, term frequency)
+    postings = {}
+    lengths = []
+    for chunk_id, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings.setdefault(token, []).append((chunk_id, count))
+
+    vocab = {}
+    postings_data = array.array("I")
+    for term in sorted(postings):
+        vocab[term] = [len(postings_data) // 2, len(postings[term])]
+        for chunk_id, count in postings[term]:
+            postings_data.append(chunk_id)
+            postings_data.append(count)
+
+    vectors_data = array.array("f", bytes(4 * vector_dim * len(chunks)))
+    for chunk_id, chunk in enumerate(chunks):
+        for d, value in trigram_vector(chunk, vector_dim).items():
+            vectors_data[chunk_id * vector_dim + d] = value
+
+    meta = {
+        "version": INDEX_VERSION,
+        "fingerprint": source_fingerprint(paths),
+        "chunk_count": len(chunks),
+        "avg_length": sum(lengths) / len(lengths) if lengths else 0.0,
+        "lengths": lengths,
+        "sources": sources,
+        "vector_dim": vector_dim,
+        "vocab": vocab,
+    }
+
+    os.makedirs(index_dir, exist_ok=True)
+    write_file(os.path.join(index_dir, "postings.bin"), postings_data.tobytes())
+    write_file(os.path.join(index_dir, "vectors.bin"), vectors_data.tobytes())
+    write_file(os.path.join(index_dir, "chunks.json"), json.dumps(chunks).encode("utf-8"))
+    # The metadata is written last, since it is what marks the index as complete
+    write_file(os.path.join(index_dir, "meta.json"), json.dumps(meta).encode("utf-8"))
+    return meta
+
+def map_file(path: str, typecode: str):
+    """Memory-map a binary file and view it as an array of typecode values."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(array.array(typecode))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+class LocalIndex:
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "chunks.json"), "r") as f:
+            self.chunks = json.load(f)
+        self.vocab = self.meta["vocab"]
+        self.lengths = self.meta["lengths"]
+        self.avg_length = self.meta["avg_length"] or 1.0
+        self.vector_dim = self.meta["vector_dim"]
+        self.postings = map_file(os.path.join(index_dir, "postings.bin"), "I")
+        self.vectors = map_file(os.path.join(index_dir, "vectors.bin"), "f")
+
+    def bm25(self, search_query: str, top_k: int) -> list[tuple[int, float]]:
+        chunk_count = len(self.chunks)
+        scores = {}
+        for term in set(tokenize(search_query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, doc_freq = entry
+            idf = math.log(1 + (chunk_count - doc_freq + 0.5) / (doc_freq + 0.5))
+            for i in range(offset, offset + doc_freq):
+                chunk_id = self.postings[2 * i]
+                freq = self.postings[2 * i + 1]
+                norm = K1 * (1 - B + B * self.lengths[chunk_id] / self.avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * freq * (K1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+    def vector(self, search_query: str, top_k: int) -> list[tuple[int, float]]:
+        query = trigram_vector(search_query, self.vector_dim)
+        if not query:
+            return []
+        scores = []
+        for chunk_id in range(len(self.chunks)):
+            base = chunk_id * self.vector_dim
+            score = sum(value * self.vectors[base + d] for d, value in query.items())
+            if score > 0:
+                scores.append((chunk_id, score))
+        return sorted(scores, key=lambda item: (-item[1], item[0]))[:top_k]
+
+    def search(self, search_query: str, top_k: int = 10, use_vectors: bool = False) -> list[str]:
+        ranked = self.bm25(search_query, top_k)
+        if use_vectors:
+            # Reciprocal rank fusion of the keyword and vector rankings
+            fused = {}
+            for results in (ranked, self.vector(search_query, top_k)):
+                for rank, (chunk_id, _) in enumerate(results):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [self.chunks[chunk_id] for chunk_id, _ in ranked]
+
+# The loaded index for each index directory, with when its PDFs are next
+# checked for changes
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def load_index(docs_dir: str, index_dir: str, check_seconds: float = 60) -> LocalIndex:
+    """
+    Returns the index for docs_dir, building it first if it doesn't exist
+    or the PDFs have changed since it was built. Once loaded, the PDFs are
+    only checked again after check_seconds, or never if it is 0.
+    """
+    loaded = _indexes.get(index_dir)
+    if loaded is not None and (check_seconds <= 0 or time.monotonic() < loaded[1]):
+        return loaded[0]
+
+    with _indexes_lock:
+        # Another thread may have checked while this one waited
+        loaded = _indexes.get(index_dir)
+        if loaded is not None and (check_seconds <= 0 or time.monotonic() < loaded[1]):
+            return loaded[0]
+
+        fingerprint = source_fingerprint(find_pdfs(docs_dir))
+        next_check = time.monotonic() + check_seconds
+        if loaded is not None and loaded[0].meta["fingerprint"] == fingerprint:
+            _indexes[index_dir] = (loaded[0], next_check)
+            return loaded[0]
+
+        meta_path = os.path.join(index_dir, "meta.json")
+        current = None
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                current = json.load(f).get("fingerprint")
+        if current != fingerprint:
+            build_index(docs_dir, index_dir)
+
+        index = LocalIndex(index_dir)
+        _indexes[index_dir] = (index, next_check)
+        return index
+
+@lru_cache(maxsize=1)
+def local_config() -> dict:
+    """Reads the local search settings from the environment once."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return {
+        "docs_dir": os.environ.get("DATASTORE_DOCS_DIR", os.path.join(script_dir, "../../docs")),
+        "index_dir": os.environ.get("DATASTORE_INDEX_DIR", os.path.join(script_dir, "../.index")),
+        "use_vectors": os.environ.get("DATASTORE_LOCAL_VECTORS", "").lower() in ("1", "true", "yes"),
+        "check_seconds": float(os.environ.get("DATASTORE_INDEX_CHECK_SECONDS", "60")),
+    }
+
+def get_index() -> LocalIndex:
+    config = local_config()
+    return load_index(config["docs_dir"], config["index_dir"], config["check_seconds"])
+
+def search(search_query: str, top_k: int = 10) -> list[str]:
+    return get_index().search(search_query, top_k, local_config()["use_vectors"])
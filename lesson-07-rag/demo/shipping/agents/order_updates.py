@@ -0,0 +1,125 @@
+import json
+import threading
+from typing import AsyncGenerator
+from google.adk.agents import BaseAgent, InvocationContext
+from google.adk.events import Event
+from .toolbox_tools import ToolboxConnection
+
+# Holds back the changes each stage of the fulfillment workflow makes to
+# orders and saves them all at once.
+#
+# The workflow used to send an UPDATE for every change, such as one for
+# the costs and another for the status once they were computed. Each one is
+# a separate round-trip to the database that locks the same orders row.
+# Inside an OrderUnitOfWorkAgent, the update tools only note the new values.
+# Each sub-agent of the unit of work is a stage, and when a stage finishes,
+# the changes it made to every order are saved with one update-orders call.
+# That is a single UPDATE statement, which MySQL runs as one transaction, so
+# either every change from the stage is saved or none are. If the stage
+# fails, or the UPDATE does, nothing from that stage is saved, and the
+# stages after it don't run. What the stages before it saved is kept.
+#
+# Outside of a unit of work, the update tools save the changes right away,
+# with update-order.
+
+class OrderUpdates:
+    """
+    The changes to each order made in the units of work that are open, by
+    invocation. buffered counts the changes that were held back, and
+    writes the UPDATEs that were sent.
+    """
+
+    def __init__(self, connection: ToolboxConnection):
+        self.connection = connection
+        self.update_order_tool = connection.tool("update-order")
+        self.update_orders_tool = connection.tool("update-orders")
+        self.units = {}
+        self.lock = threading.Lock()
+        self.buffered = 0
+        self.writes = 0
+
+    def begin(self, invocation_id: str):
+        with self.lock:
+            self.units[invocation_id] = {}
+
+    def discard(self, invocation_id: str):
+        with self.lock:
+            self.units.pop(invocation_id, None)
+
+    async def write(self, invocation_id: str, order_id: int, columns: dict):
+        result = await self.update_order_tool(order_id=order_id, **columns)
+        self.written(invocation_id)
+        return result
+
+    def written(self, invocation_id: str):
+        with self.lock:
+            self.writes += 1
+        # Anything read earlier in this invocation is now out of date
+        self.connection.cache.clear(invocation_id)
+
+    async def save(self, tool_context, order_id: int, columns: dict) -> dict:
+        """Note the changes to an order, or save them if there is no unit of work.
+
+        Args:
+            tool_context: The context of the tool making the changes.
+            order_id: The ID of the order to change.
+            columns: The new value of each column that changes.
+        """
+        order_id = int(order_id)
+        with self.lock:
+            unit = self.units.get(tool_context.invocation_id)
+            if unit is not None:
+                unit.setdefault(order_id, {}).update(columns)
+                self.buffered += 1
+        if unit is not None:
+            return {
+                "status": "success",
+                "order_id": order_id,
+                "message": "The changes will be saved when this step is finished.",
+            }
+        result = await self.write(tool_context.invocation_id, order_id, columns)
+        return {"status": "success", "order_id": order_id, "result": result}
+
+    async def flush(self, invocation_id: str) -> list[int]:
+        """Save the changes noted in a unit of work, returning the order IDs saved.
+
+        Every order is saved by the same UPDATE statement, so if it fails,
+        none of them are.
+        """
+        with self.lock:
+            unit = self.units.get(invocation_id) or {}
+            if unit:
+                # The next stage starts with nothing noted
+                self.units[invocation_id] = {}
+        if unit:
+            changes = [{"order_id": order_id, **columns} for order_id, columns in unit.items()]
+            await self.update_orders_tool(changes=json.dumps(changes))
+            self.written(invocation_id)
+        return list(unit)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "open_units": len(self.units),
+                "buffered": self.buffered,
+                "writes": self.writes,
+            }
+
+class OrderUnitOfWorkAgent(BaseAgent):
+    """
+    Runs its sub-agents one after the other, as stages. Once each stage
+    finishes, the changes it made to orders are saved with a single UPDATE.
+    """
+
+    updates: OrderUpdates
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        self.updates.begin(ctx.invocation_id)
+        try:
+            for agent in self.sub_agents:
+                async for event in agent.run_async(ctx):
+                    yield event
+                await self.updates.flush(ctx.invocation_id)
+        finally:
+            # If a stage failed, the changes it noted are dropped
+            self.updates.discard(ctx.invocation_id)
@@ -0,0 +1,177 @@
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+# One place that loads the prompts for every agent in this package.
+#
+# All of the prompt files are loaded together the first time any prompt is
+# needed, and every agent that uses the same prompt gets the same string.
+# After the first load, the prompts are also packed into a single bundle
+# file, so later startups read that one file instead of every prompt file.
+# The bundle is memory-mapped and remembers the size and modification time
+# of each prompt file, so it is rebuilt whenever a prompt changes.
+#
+# With PROMPTS_HOT_RELOAD turned on, read_prompt() returns a function that
+# ADK calls for the current instruction, so edits to a prompt file are
+# picked up without restarting.
+
+BUNDLE_MAGIC = b"PROMPTS1"
+HEADER_SIZE = struct.Struct("<Q")
+
+# How often, in seconds, hot reload checks the prompt files for changes
+RELOAD_INTERVAL = 1.0
+
+def scan_prompts(prompts_dir: str) -> dict[str, tuple[int, int]]:
+    """The size and modification time of each prompt file, without reading them."""
+    files = {}
+    with os.scandir(prompts_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".txt"):
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+def fingerprint(files: dict[str, tuple[int, int]]) -> list:
+    return sorted([name, size, mtime] for name, (size, mtime) in files.items())
+
+def write_bundle(path: str, prompts: dict[str, str], files: dict[str, tuple[int, int]]):
+    """
+    The bundle is a fixed header, the length of a JSON index, the index
+    itself, and then the UTF-8 text of every prompt, one after the other.
+    """
+    body = bytearray()
+    index = {}
+    for name, text in prompts.items():
+        data = text.encode("utf-8")
+        index[name] = [len(body), len(data)]
+        body += data
+    header = json.dumps({"fingerprint": fingerprint(files), "prompts": index}).encode("utf-8")
+
+    # Write to a temporary file first so readers never see half a bundle
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC + HEADER_SIZE.pack(len(header)) + header + body)
+    os.replace(tmp_path, path)
+
+def read_bundle(path: str, files: dict[str, tuple[int, int]]) -> dict[str, str] | None:
+    """The prompts in the bundle, or None if it is missing or out of date."""
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    with mapped:
+        if mapped[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            return None
+        start = len(BUNDLE_MAGIC) + HEADER_SIZE.size
+        (header_size,) = HEADER_SIZE.unpack_from(mapped, len(BUNDLE_MAGIC))
+        try:
+            header = json.loads(mapped[start:start + header_size])
+        except ValueError:
+            return None
+        if header.get("fingerprint") != fingerprint(files):
+            return None
+        body = start + header_size
+        return {
+            name: mapped[body + offset:body + offset + length].decode("utf-8")
+            for name, (offset, length) in header["prompts"].items()
+        }
+
+class PromptRegistry:
+
+    def __init__(self, prompts_dir: str, bundle_path: str = None, hot_reload: bool = False):
+        self.prompts_dir = prompts_dir
+        self.bundle_path = bundle_path
+        self.hot_reload = hot_reload
+        self.lock = threading.RLock()
+        self.prompts = None
+        self.files = {}
+        self.last_check = 0.0
+        self.timing = {}
+        self.reloads = 0
+
+    def load(self):
+        start = time.perf_counter()
+        files = scan_prompts(self.prompts_dir)
+        prompts = None
+        source = "bundle"
+        if self.bundle_path:
+            prompts = read_bundle(self.bundle_path, files)
+        if prompts is None:
+            source = "files"
+            prompts = {}
+            for name in sorted(files):
+                with open(os.path.join(self.prompts_dir, name), "r") as f:
+                    prompts[name] = f.read()
+            if self.bundle_path:
+                try:
+                    write_bundle(self.bundle_path, prompts, files)
+                except OSError as e:
+                    logging.warning(f"Could not write the prompt bundle {self.bundle_path}: {e}")
+
+        # Identical prompts share one string
+        self.prompts = {name: sys.intern(text) for name, text in prompts.items()}
+        self.files = files
+        self.last_check = time.monotonic()
+        self.timing = {
+            "source": source,
+            "prompts": len(prompts),
+            "files_read": 1 if source == "bundle" else len(prompts),
+            "load_ms": (time.perf_counter() - start) * 1000,
+        }
+        logging.info(f"Loaded {len(prompts)} prompts from {source} in {self.timing['load_ms']:.1f} ms")
+
+    def reload_if_changed(self) -> bool:
+        """Reload the prompts if any prompt file was added, removed or edited."""
+        with self.lock:
+            self.last_check = time.monotonic()
+            if scan_prompts(self.prompts_dir) == self.files:
+                return False
+            self.load()
+            self.reloads += 1
+            return True
+
+    def get(self, filename: str) -> str:
+        with self.lock:
+            if self.prompts is None:
+                self.load()
+            elif self.hot_reload and time.monotonic() - self.last_check >= RELOAD_INTERVAL:
+                self.reload_if_changed()
+            if filename not in self.prompts:
+                raise FileNotFoundError(f"No prompt named {filename} in {self.prompts_dir}")
+            return self.prompts[filename]
+
+    def instruction(self, filename: str):
+        """
+        The prompt, for use as an agent's instruction. With hot reload on,
+        this is a function that returns the prompt as it is now.
+        """
+        prompt = self.get(filename)
+        if not self.hot_reload:
+            return prompt
+        return lambda context: self.get(filename)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.timing, "reloads": self.reloads}
+
+@functools.lru_cache(maxsize=None)
+def get_registry() -> PromptRegistry:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return PromptRegistry(
+        prompts_dir=os.path.normpath(os.path.join(script_dir, "../prompts")),
+        bundle_path=os.environ.get("PROMPTS_BUNDLE", os.path.join(script_dir, "../.prompts.bundle")) or None,
+        hot_reload=os.environ.get("PROMPTS_HOT_RELOAD", "").lower() in ("1", "true", "yes"),
+    )
+
+def read_prompt(filename: str):
+    return get_registry().instruction(filename)
+
+def prompt_stats() -> dict:
+    return get_registry().stats()
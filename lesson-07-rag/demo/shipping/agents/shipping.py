@@ -5,9 +5,11 @@ from typing import Optional, AsyncGenerator, List
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LlmAgent, InvocationContext, BaseAgent
 from google.adk.events import Event
 from google.adk.tools.tool_context import ToolContext
-from toolbox_core import ToolboxSyncClient
 from .rates import SHIPPING_RATES, TAX_RATES
 from .products import products
+from .prompt_registry import read_prompt
+from .toolbox_tools import get_connection
+from .order_updates import OrderUpdates, OrderUnitOfWorkAgent
 
 # OrderStatus Enum for consistency with DB strings
 from enum import Enum
@@ -20,22 +22,18 @@ class OrderStatus(Enum):
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 # --- Database Connection ---
+# Nothing connects to Toolbox until the tools are first used
 toolbox_url = os.environ.get("TOOLBOX_URL", "http://127.0.0.1:5000")
-print(f"Connecting to Toolbox at {toolbox_url}")
-db_client = ToolboxSyncClient(toolbox_url)
+db_client = get_connection(toolbox_url)
+
+# Orders read during a turn are cached by order ID until one of them is updated
+get_order_tool = db_client.tool("get-order", cached=True, key="order_id")
+get_open_order_tool = db_client.tool("get-open-order-for-user", cached=True, key="order_id")
+update_order_status_tool = db_client.tool("update-order-status", clears_cache=True)
 
-get_order_tool = db_client.load_tool("get-order")
-get_open_order_tool = db_client.load_tool("get-open-order-for-user")
-update_order_address_tool = db_client.load_tool("update-order-address")
-update_order_status_tool = db_client.load_tool("update-order-status")
-update_order_costs_tool = db_client.load_tool("update-order-costs")
+# The changes each step makes to the order are saved together once it is done
+order_updates = OrderUpdates(db_client)
 
 # --- Schemas ---
 
@@ -100,6 +98,39 @@ def calculate_taxes_cost(cart_items: List[str], state: str) -> dict:
     tax_amount = subtotal * rate
     return {"tax_amount": round(tax_amount, 2), "state": state, "subtotal": subtotal}
 
+async def update_order_address(address: str, order_id: int, tool_context: ToolContext) -> dict:
+    """Update the shipping address for an order.
+
+    Args:
+        address: The address as a JSON string.
+        order_id: The ID of the order to update.
+    """
+    return await order_updates.save(tool_context, order_id, {"address": address})
+
+async def update_order_costs(
+    shipping_cost: float,
+    tax_amount: float,
+    total_cost: float,
+    status: str,
+    order_id: int,
+    tool_context: ToolContext,
+) -> dict:
+    """Update the costs and status of an order.
+
+    Args:
+        shipping_cost: The calculated shipping cost.
+        tax_amount: The calculated tax amount.
+        total_cost: The total cost of the order.
+        status: The new status of the order.
+        order_id: The ID of the order to update.
+    """
+    return await order_updates.save(tool_context, order_id, {
+        "shipping_cost": shipping_cost,
+        "tax_amount": tax_amount,
+        "total_cost": total_cost,
+        "order_status": status,
+    })
+
 def compute_subtotal(cart_items: List[str]) -> float:
     subtotal = 0.0
     for product_id in cart_items:
@@ -158,8 +189,10 @@ compute_order_agent = LlmAgent(
     description="Combines shipping and tax costs to compute the order total.",
     model=model,
     instruction=read_prompt("compute-order-prompt.txt"),
-    tools=[compute_order_cost, update_order_costs_tool],
+    tools=[compute_order_cost, update_order_costs],
     output_schema=ComputeOrderOutput,
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
 )
 
 place_order_agent = LlmAgent(
@@ -167,8 +200,10 @@ place_order_agent = LlmAgent(
     description="Handles the initial placement of an order by setting the address.",
     model=model,
     instruction=read_prompt("place-order-prompt.txt"),
-    tools=[get_user, get_order_tool, get_open_order_tool, update_order_address_tool],
+    tools=[get_user, get_order_tool, get_open_order_tool, update_order_address],
     output_schema=PlaceOrderOutput,
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
 )
 
 order_summary_agent = LlmAgent(
@@ -184,20 +219,33 @@ approve_order_agent = LlmAgent(
     model=model,
     instruction=read_prompt("approve-order-prompt.txt"),
     tools=[update_order_status_tool],
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
 )
 
 # --- Main Shipping Agent ---
 
 shipping_instruction = read_prompt("shipping-prompt.txt")
 
+# Places the order and computes its costs, saving the changes each of these
+# stages makes to the order with one UPDATE at the end of the stage
+order_update_agent = OrderUnitOfWorkAgent(
+    name="order_update_agent",
+    description="Places the order and calculates its costs, then saves the order.",
+    sub_agents=[
+        place_order_agent,
+        costs_agent,
+        compute_order_agent,
+    ],
+    updates=order_updates,
+)
+
 # The new full fulfillment workflow
 fulfillment_workflow_agent = SequentialAgent(
     name="fulfillment_workflow",
     description="Calculates costs after an order is placed.",
     sub_agents=[
-        place_order_agent,
-        costs_agent,
-        compute_order_agent,
+        order_update_agent,
         order_summary_agent,
     ],
 )
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from typing import AsyncGenerator, Optional
+
+from aiohttp import web
+from google.adk.agents import BaseAgent, InvocationContext, ParallelAgent
+from google.adk.events import Event
+from google.adk.runners import InMemoryRunner
+from google.adk.tools import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+from toolbox_core import ToolboxSyncClient
+
+from agents.toolbox_tools import get_connection
+
+# Checks that the sub-agents of a ParallelAgent really wait for Toolbox at
+# the same time.
+#
+# It starts a stand-in Toolbox server that answers every tool call after
+# --delay seconds, and runs a ParallelAgent shaped like costs_agent in which
+# each sub-agent calls one Toolbox tool through ADK's FunctionTool, the same
+# way an LlmAgent runs a tool the model asked for. This is done once with
+# the tools the agents use, from agents/toolbox_tools.py, and once with
+# tools loaded by a ToolboxSyncClient, which is how the agents used to load
+# them. It prints how long each run took and when each call started and
+# finished, and exits with an error if the calls didn't overlap.
+#
+# The stand-in server only speaks the HTTP API of toolbox-core 0.5, which is
+# why requirements.txt keeps toolbox-core below 0.6. Newer clients talk to
+# Toolbox another way and get a 404 from it.
+#
+# Run it from this directory: python toolbox_overlap.py
+
+TOOL_NAMES = ["get-order", "get-open-order-for-user"]
+
+def make_toolbox_app(tool_names: list[str], delay: float) -> web.Application:
+    """A server that answers like Toolbox, after waiting for the delay."""
+    manifest = {
+        "serverVersion": "0.0.0-overlap",
+        "tools": {
+            name: {
+                "description": f"Stand-in for the {name} tool.",
+                "parameters": [{"name": "id", "type": "string", "description": "The ID to look up."}],
+            }
+            for name in tool_names
+        },
+    }
+
+    async def toolset(request):
+        return web.json_response(manifest)
+
+    async def tool(request):
+        name = request.match_info["name"]
+        return web.json_response({"serverVersion": manifest["serverVersion"], "tools": {name: manifest["tools"][name]}})
+
+    async def invoke(request):
+        args = await request.json()
+        await asyncio.sleep(delay)
+        return web.json_response({"result": json.dumps([{"id": args.get("id")}])})
+
+    app = web.Application()
+    app.router.add_get("/api/toolset/", toolset)
+    app.router.add_get("/api/tool/{name}", tool)
+    app.router.add_post("/api/tool/{name}/invoke", invoke)
+    return app
+
+def start_toolbox(tool_names: list[str], delay: float) -> str:
+    """Run the stand-in server in a thread of its own, returning its URL."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(make_toolbox_app(tool_names, delay))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+class ToolCallAgent(BaseAgent):
+    """Calls one tool, and records when the call started and finished."""
+
+    tool: FunctionTool
+    call: Optional[tuple] = None
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        start = time.perf_counter()
+        result = await self.tool.run_async(
+            args={"id": self.name},
+            tool_context=ToolContext(ctx),
+        )
+        self.call = (self.name, start, time.perf_counter())
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=str(result))]),
+        )
+
+async def run_parallel(tools: list) -> tuple[float, list]:
+    branches = [ToolCallAgent(name=f"branch_{i}", tool=FunctionTool(tool)) for i, tool in enumerate(tools)]
+    agent = ParallelAgent(name="other_costs_agent", sub_agents=branches)
+    runner = InMemoryRunner(agent=agent, app_name="toolbox_overlap")
+    session = await runner.session_service.create_session(app_name="toolbox_overlap", user_id="user")
+    message = types.Content(role="user", parts=[types.Part(text="Go")])
+    start = time.perf_counter()
+    async for _ in runner.run_async(user_id="user", session_id=session.id, new_message=message):
+        pass
+    return time.perf_counter() - start, [branch.call for branch in branches]
+
+def report(label: str, elapsed: float, calls: list) -> bool:
+    first = min(start for _, start, _ in calls)
+    overlapped = max(start for _, start, _ in calls) < min(end for _, _, end in calls)
+    print(f"{label}: {elapsed:.2f}s, calls {'overlapped' if overlapped else 'ran one after the other'}")
+    for name, start, end in sorted(calls, key=lambda call: call[1]):
+        print(f"  {name:10} {start - first:6.2f}s to {end - first:6.2f}s")
+    return overlapped
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that parallel sub-agents overlap their Toolbox calls.")
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds the stand-in Toolbox takes to answer.")
+    args = parser.parse_args()
+
+    url = start_toolbox(TOOL_NAMES, args.delay)
+    print(f"Stand-in Toolbox at {url}, answering after {args.delay}s")
+
+    # Load the tools up front, so only the calls themselves are timed
+    connection = get_connection(url)
+    lazy_tools = [connection.tool(name) for name in TOOL_NAMES]
+    for tool in lazy_tools:
+        tool.resolve()
+    sync_client = ToolboxSyncClient(url)
+    sync_tools = [sync_client.load_tool(name) for name in TOOL_NAMES]
+
+    async_time, async_calls = asyncio.run(run_parallel(lazy_tools))
+    sync_time, sync_calls = asyncio.run(run_parallel(sync_tools))
+    connection.run(connection.close()).result()
+    sync_client.close()
+
+    overlapped = report("toolbox_tools", async_time, async_calls)
+    report("ToolboxSyncClient", sync_time, sync_calls)
+    sys.exit(0 if overlapped else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+-- Adds the full-text index used by the search-products tool to a products
+-- table created before the index was part of inventory.sql.
+--
+-- The first FULLTEXT index on an InnoDB table rebuilds the table, and writes
+-- to it are blocked until that is done, so run this when the store is quiet.
+-- On a large table, expect it to take about as long as copying the table.
+
+ALTER TABLE products ADD FULLTEXT KEY products_search (name, description);
+
+-- Refresh the statistics so the optimizer knows about the new index
+ANALYZE TABLE products;
@@ -0,0 +1,288 @@
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+# Compares the old REGEXP search-products statement with the FULLTEXT one in
+# tools.yaml, on a generated catalog of products in a local MySQL server.
+#
+# By default this starts a throwaway MySQL 8.0 container with docker, fills
+# a products table with --rows generated products (1,000,000 unless told
+# otherwise), times each search statement before and after running the
+# FULLTEXT migration, and prints the latency of each. Both statements return
+# the same columns and the same page of --limit rows, so the difference
+# between them is the table scan against the index, not how many rows are
+# sent back. Use --no-docker with --host/--port/--user/--password to use a
+# server that is already running instead. With --keep, or with --no-docker, the generated table is reused by
+# the next run with the same --rows, so only the first run pays for loading it.
+#
+# Needs the PyMySQL package: pip install pymysql
+
+MIGRATION_FILE = "migrations/001-products-fulltext.sql"
+
+# The old search-products statement, with the same columns and page as the
+# FULLTEXT one
+REGEXP_STATEMENT = """
+SELECT product_id, name, description, price FROM products
+WHERE LOWER(CONCAT(name, ' ', description))
+REGEXP LOWER(REPLACE(TRIM(%s), ' ', '|'))
+LIMIT %s OFFSET %s
+"""
+
+# The same statement as search-products in tools.yaml
+FULLTEXT_STATEMENT = """
+SELECT product_id, name, description, price FROM products
+WHERE MATCH(name, description) AGAINST (%s IN NATURAL LANGUAGE MODE)
+LIMIT %s OFFSET %s
+"""
+
+QUERIES = [
+    "wireless headphones",
+    "usb cable",
+    "portable speaker waterproof",
+    "ergonomic mouse",
+    "keyboard",
+    "aluminum laptop stand",
+]
+
+ADJECTIVES = [
+    "wireless", "portable", "ergonomic", "compact", "rugged", "smart",
+    "waterproof", "adjustable", "braided", "mechanical", "premium", "slim",
+    "foldable", "magnetic", "backlit", "dual", "noise", "fast", "ultra", "mini",
+]
+NOUNS = [
+    "headphones", "speaker", "mouse", "keyboard", "cable", "charger", "stand",
+    "sleeve", "case", "hub", "webcam", "watch", "monitor", "tablet", "dock",
+    "adapter", "microphone", "router", "lamp", "tripod",
+]
+FEATURES = [
+    "with 20h battery life", "for 13-inch laptops", "with usb receiver",
+    "with heart rate monitor", "for all smartphones", "with fast charging",
+    "with built-in microphone", "with rgb lighting", "made of aluminum",
+    "for travel", "with noise cancelling", "for gaming", "for the office",
+    "with a two year warranty", "in three colors",
+]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def generate_products(count, seed=14):
+    rng = random.Random(seed)
+    for i in range(count):
+        adjective = rng.choice(ADJECTIVES)
+        noun = rng.choice(NOUNS)
+        name = f"{adjective.title()} {noun.title()} {rng.choice('ABCDEFGHJKLMNPRSTVXZ')}{rng.randrange(100, 1000)}"
+        first, second = rng.sample(ADJECTIVES, 2)
+        description = f"{first} {second} {noun} {rng.choice(FEATURES)}"
+        price = round(rng.uniform(5, 500), 2)
+        yield (f"B{i + 1:07d}", name, description.capitalize(), price)
+
+def start_container(args):
+    if shutil.which("docker") is None:
+        sys.exit("docker was not found. Install it, or use --no-docker with a running MySQL server.")
+    running = subprocess.run(
+        ["docker", "ps", "-q", "-f", f"name=^{args.container}$"],
+        capture_output=True, text=True,
+    )
+    if running.stdout.strip():
+        print(f"Using the running container {args.container}")
+        return
+    subprocess.run([
+        "docker", "run", "-d", "--rm",
+        "--name", args.container,
+        "-e", f"MYSQL_ROOT_PASSWORD={args.password}",
+        "-e", f"MYSQL_DATABASE={args.database}",
+        "-p", f"{args.port}:3306",
+        args.image,
+    ], check=True, capture_output=True)
+    print(f"Started {args.image} as container {args.container} on port {args.port}")
+
+def stop_container(args):
+    subprocess.run(["docker", "stop", args.container], capture_output=True)
+    print(f"Stopped container {args.container}")
+
+def connect(args, timeout=120):
+    import pymysql
+
+    # A new container takes a while before it accepts connections
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return pymysql.connect(
+                host=args.host,
+                port=args.port,
+                user=args.user,
+                password=args.password,
+                database=args.database,
+                autocommit=True,
+            )
+        except pymysql.err.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(2)
+
+def has_fulltext_index(cursor):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'products' AND index_type = 'FULLTEXT'"
+    )
+    return cursor.fetchone()[0] > 0
+
+def load_products(cursor, rows, batch_size=5000):
+    """Create the products table without the full-text index and fill it."""
+    cursor.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = 'products'")
+    if cursor.fetchone()[0]:
+        cursor.execute("SELECT COUNT(*) FROM products")
+        if cursor.fetchone()[0] == rows:
+            if has_fulltext_index(cursor):
+                cursor.execute("ALTER TABLE products DROP INDEX products_search")
+            print(f"Reusing the existing table of {rows:,} products")
+            return
+        cursor.execute("DROP TABLE products")
+
+    # The same columns as inventory.sql, but the index is added later by the migration
+    cursor.execute("""
+        CREATE TABLE products (
+            product_id VARCHAR(255) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            price DECIMAL(10, 2) NOT NULL
+        )
+    """)
+    start = time.perf_counter()
+    batch = []
+    for product in generate_products(rows):
+        batch.append(product)
+        if len(batch) == batch_size:
+            cursor.executemany("INSERT INTO products VALUES (%s, %s, %s, %s)", batch)
+            batch = []
+    if batch:
+        cursor.executemany("INSERT INTO products VALUES (%s, %s, %s, %s)", batch)
+    cursor.execute("ANALYZE TABLE products")
+    cursor.fetchall()
+    print(f"Loaded {rows:,} products in {time.perf_counter() - start:.1f}s")
+
+def run_migration(cursor):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(script_dir, MIGRATION_FILE), "r") as f:
+        lines = [line for line in f if not line.lstrip().startswith("--")]
+    start = time.perf_counter()
+    for statement in "".join(lines).split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+            cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    print(f"Ran {MIGRATION_FILE} in {elapsed:.1f}s")
+    return elapsed
+
+def time_statement(cursor, statement, params, repeat):
+    # The first run warms the buffer pool and isn't counted
+    cursor.execute(statement, params)
+    rows = len(cursor.fetchall())
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(statement, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "rows": rows,
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+    }
+
+def print_results(title, results):
+    print()
+    print(title)
+    print(f"  {'query':<30} {'rows':>8} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+    for query, result in results.items():
+        print(
+            f"  {query:<30} {result['rows']:>8,} {result['p50_ms']:>10.1f} "
+            f"{result['p95_ms']:>10.1f} {result['mean_ms']:>10.1f}"
+        )
+
+def run_benchmark(args):
+    connection = connect(args)
+    report = {"rows": args.rows, "repeat": args.repeat, "limit": args.limit}
+    with connection.cursor() as cursor:
+        load_products(cursor, args.rows)
+
+        regexp = {}
+        for query in QUERIES:
+            regexp[query] = time_statement(cursor, REGEXP_STATEMENT, (query, args.limit, 0), args.repeat)
+        print_results(f"REGEXP (table scan), first page of {args.limit}", regexp)
+
+        report["migration_sec"] = run_migration(cursor)
+
+        fulltext = {}
+        for query in QUERIES:
+            fulltext[query] = time_statement(cursor, FULLTEXT_STATEMENT, (query, args.limit, 0), args.repeat)
+        print_results(f"FULLTEXT, first page of {args.limit}", fulltext)
+
+        # A later page, to show what deep offsets cost
+        page_offset = args.limit * 10
+        paged = {}
+        for query in QUERIES:
+            paged[query] = time_statement(cursor, FULLTEXT_STATEMENT, (query, args.limit, page_offset), args.repeat)
+        print_results(f"FULLTEXT, offset {page_offset}", paged)
+    connection.close()
+
+    print()
+    print(f"FULLTEXT against REGEXP, first page of {args.limit}")
+    for query in QUERIES:
+        speedup = regexp[query]["p50_ms"] / max(fulltext[query]["p50_ms"], 0.001)
+        print(f"  {query:<30} {speedup:>8.0f}x faster at p50")
+
+    report["regexp"] = regexp
+    report["fulltext"] = fulltext
+    report["fulltext_paged"] = paged
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the REGEXP and FULLTEXT product search statements.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of products to generate.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each query.")
+    parser.add_argument("--limit", type=int, default=10, help="Page size for both searches.")
+    parser.add_argument("--no-docker", action="store_true", help="Use a MySQL server that is already running.")
+    parser.add_argument("--image", default="mysql:8.0", help="MySQL docker image.")
+    parser.add_argument("--container", default="search-benchmark-mysql", help="Name of the docker container.")
+    parser.add_argument("--keep", action="store_true", help="Leave the container running afterwards.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--database", default="storefront_benchmark")
+    parser.add_argument("--out", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    try:
+        import pymysql  # noqa: F401
+    except ImportError:
+        sys.exit("The benchmark needs PyMySQL: pip install pymysql")
+
+    if not args.no_docker:
+        start_container(args)
+    try:
+        report = run_benchmark(args)
+    finally:
+        if not args.no_docker and not args.keep:
+            stop_container(args)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
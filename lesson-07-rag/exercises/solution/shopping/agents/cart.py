@@ -1,18 +1,14 @@
-import os
+import json
+from collections import Counter
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LlmAgent
 from google.adk.tools import ToolContext
 
 from .order_data import orders, OrderStatus, get_next_order_id
-from .inventory import inventory_data_agent
+from .inventory import inventory_data_agent, check_inventory_bulk_tool
+from .prompt_registry import read_prompt
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 def get_order(tool_context: ToolContext):
     """
     Retrieves the order for the current session
@@ -53,6 +49,42 @@ def add_to_cart(product_id: str, tool_context: ToolContext):
     order["cart"].append(product_id)
     return {"status": "success", "message": f"Added {product_id} to cart.", "cart": order["cart"]}
 
+async def check_cart_inventory(tool_context: ToolContext):
+    """
+    Checks that there is enough stock for every item in the cart of the
+    current session's order.
+    """
+    order_id = tool_context.state.get("order_id")
+    if not order_id or order_id not in orders:
+        return {"error": "No active order session found. Please get order first."}
+
+    # How many of each product the cart needs
+    needed = Counter(orders[order_id]["cart"])
+    if not needed:
+        return {"status": "success", "order_id": order_id, "in_stock": True, "products": [], "message": "The cart is empty."}
+
+    # The whole cart is checked with one query
+    result = await check_inventory_bulk_tool(product_ids=json.dumps(list(needed)))
+    counts = {row["product_id"]: row["count"] for row in json.loads(result) or []}
+
+    products = [
+        {
+            "product_id": product_id,
+            "quantity": quantity,
+            "count": counts.get(product_id, 0),
+            "in_stock": counts.get(product_id, 0) >= quantity,
+        }
+        for product_id, quantity in needed.items()
+    ]
+    unavailable = [product["product_id"] for product in products if not product["in_stock"]]
+    return {
+        "status": "success",
+        "order_id": order_id,
+        "in_stock": not unavailable,
+        "products": products,
+        "unavailable": unavailable,
+    }
+
 # --- Sub-Agents ---
 
 get_order_agent = LlmAgent(
@@ -78,6 +110,15 @@ cart_prep_agent = ParallelAgent(
     sub_agents=[get_order_agent, inventory_data_agent],
 )
 
+# Checks the whole cart at once, such as before the order is placed
+cart_check_agent = LlmAgent(
+    name="cart_check_agent",
+    description="Checks that every item in the cart is in stock.",
+    model=model,
+    instruction=read_prompt("cart-check-prompt.txt"),
+    tools=[check_cart_inventory],
+)
+
 # Sequential Workflow: Prep -> Add Item
 cart_agent = SequentialAgent(
     name="cart_agent",
@@ -1,7 +1,17 @@
+import asyncio
+import json
 import logging
 import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
 from google.api_core.client_options import ClientOptions
 from google.cloud import discoveryengine_v1 as discoveryengine
+from . import chunk_filter, local_search
 
 # Definition of a tool that accesses a Vertex AI Search Datastore
 
@@ -15,33 +25,182 @@ from google.cloud import discoveryengine_v1 as discoveryengine
 # You can see the definitions at
 # https://cloud.google.com/python/docs/reference/discoveryengine/latest/google.cloud.discoveryengine_v1.types
 #
-def search(
-    project_id: str,
-    location: str,
-    engine_id: str,
-    search_query: str,
-) -> list[str]:
+
+# Creating a SearchServiceClient sets up a new gRPC channel, which means a
+# TLS handshake and fetching credentials. Clients are thread safe, so we
+# create one per endpoint the first time it is needed and reuse it for
+# every search after that.
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Async clients, for each event loop. The loops are weak keys, so a loop's
+# clients are dropped along with it instead of being kept around, and one
+# can never be handed to a new loop that happens to reuse the old one's id.
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_client(location: str) -> discoveryengine.SearchServiceClient:
     #  For more information, refer to:
     # https://cloud.google.com/generative-ai-app-builder/docs/locations#specify_a_multi-region_for_your_data_store
-    client_options = (
-        ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
+    api_endpoint = (
+        f"{location}-discoveryengine.googleapis.com"
         if location != "global"
         else None
     )
+    key = (location, api_endpoint)
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client_options = (
+                    ClientOptions(api_endpoint=api_endpoint)
+                    if api_endpoint
+                    else None
+                )
+                client = discoveryengine.SearchServiceClient(client_options=client_options)
+                _clients[key] = client
+    return client
+
+def get_async_client(location: str) -> discoveryengine.SearchServiceAsyncClient:
+    # An async client's channel belongs to the event loop it was created on,
+    # so these are shared per location and per loop.
+    api_endpoint = (
+        f"{location}-discoveryengine.googleapis.com"
+        if location != "global"
+        else None
+    )
+    key = (location, api_endpoint)
+    loop = asyncio.get_running_loop()
+
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client_options = (
+                ClientOptions(api_endpoint=api_endpoint)
+                if api_endpoint
+                else None
+            )
+            client = discoveryengine.SearchServiceAsyncClient(client_options=client_options)
+            clients[key] = client
+    return client
+
+class SearchCache:
+    """
+    An in-process cache of search results with a time to live (TTL) and
+    least recently used (LRU) eviction once max_entries is reached.
+    If a path is given, entries are also written to a SQLite file so they
+    survive restarts. hits, disk_hits and misses count how the cache was used.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, results TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self.db.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, results = entry
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return list(results)
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT results, expires FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    results = json.loads(row[0])
+                    self.store(key, results, row[1])
+                    self.disk_hits += 1
+                    return results
 
-    # Create a client
-    client = discoveryengine.SearchServiceClient(client_options=client_options)
+            self.misses += 1
+            return None
 
+    def put(self, key: str, results: list[str]):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self.store(key, results, expires)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, results, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(results), expires),
+                )
+                self.db.execute("DELETE FROM search_cache WHERE expires <= ?", (time.time(),))
+                self.db.commit()
+
+    def store(self, key: str, results: list[str], expires: float):
+        # Must be called with the lock held
+        self.entries[key] = (expires, results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+def normalize_query(search_query: str) -> str:
+    """Lowercase the query and drop punctuation and extra whitespace."""
+    return " ".join(re.findall(r"\w+", search_query.lower()))
+
+@lru_cache(maxsize=1)
+def search_cache():
+    """
+    The shared result cache, configured from the environment. Setting
+    DATASTORE_CACHE_SIZE to 0 turns caching off.
+    """
+    max_entries = int(os.environ.get("DATASTORE_CACHE_SIZE", "256"))
+    if max_entries <= 0:
+        return None
+    return SearchCache(
+        max_entries=max_entries,
+        ttl=float(os.environ.get("DATASTORE_CACHE_TTL", "3600")),
+        path=os.environ.get("DATASTORE_CACHE_PATH") or None,
+    )
+
+def cache_stats() -> dict:
+    cache = search_cache()
+    return cache.stats() if cache else {}
+
+def serving_config_path(project_id: str, location: str, engine_id: str) -> str:
     # The full resource name of the search app serving config
-    serving_config = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
+    return f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
 
+def build_request(serving_config: str, search_query: str) -> dict:
     # discoveryengine.SearchRequest.ContentSearchSpec
     content_search_spec = {
         "search_result_mode": discoveryengine.SearchRequest.ContentSearchSpec.SearchResultMode.CHUNKS
     }
 
     # discoveryengine.SearchRequest
-    request = {
+    return {
         "serving_config": serving_config,
         "query": search_query,
         "page_size": 10,
@@ -54,29 +213,188 @@ def search(
         },
     }
 
-    page_result = client.search(request)
+def search_target(project_id: str, location: str, engine_id: str) -> str:
+    # What the results come from, as part of the cache key: the local index,
+    # or the serving config of the Vertex AI Search app
+    if datastore_config()["backend"] == "local":
+        return "local"
+    return serving_config_path(project_id, location, engine_id)
+
+def search(
+    project_id: str,
+    location: str,
+    engine_id: str,
+    search_query: str,
+) -> list[str]:
+    """
+    Searches the datastore, or the local index of the docs if
+    DATASTORE_BACKEND is "local".
+    """
+    serving_config = search_target(project_id, location, engine_id)
+
+    # Repeated questions are answered from the cache without calling Vertex
+    cache = search_cache()
+    cache_key = json.dumps([normalize_query(search_query), engine_id, serving_config])
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if serving_config == "local":
+        results = local_search.search(search_query)
+    else:
+        # Get the shared client for this location
+        client = get_client(location)
 
-    results = []
-    for result in page_result:
-        if result.chunk and result.chunk.content:
-            results.append(result.chunk.content)
+        page_result = client.search(build_request(serving_config, search_query))
+
+        results = []
+        for result in page_result:
+            if result.chunk and result.chunk.content:
+                results.append(result.chunk.content)
+
+    # Empty results aren't cached, in case the datastore is still indexing
+    if cache and results:
+        cache.put(cache_key, results)
 
     return results
 
-def datastore_search_tool( search_query: str ):
+async def async_search(
+    project_id: str,
+    location: str,
+    engine_id: str,
+    search_query: str,
+) -> list[str]:
+    """
+    The same as search(), but uses the async client so it doesn't block
+    the event loop the agent is running on.
+    """
+    serving_config = search_target(project_id, location, engine_id)
+
+    cache = search_cache()
+    cache_key = json.dumps([normalize_query(search_query), engine_id, serving_config])
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if serving_config == "local":
+        results = await asyncio.to_thread(local_search.search, search_query)
+    else:
+        client = get_async_client(location)
+
+        page_result = await client.search(build_request(serving_config, search_query))
+
+        results = []
+        async for result in page_result:
+            if result.chunk and result.chunk.content:
+                results.append(result.chunk.content)
+
+    if cache and results:
+        cache.put(cache_key, results)
+
+    return results
+
+def merge_results(result_lists: list[list[str]]) -> list[str]:
+    """
+    Interleave the results of several searches, so the best result of each
+    comes first, and drop chunks that more than one search returned.
+    """
+    merged = []
+    seen = set()
+    for i in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if i < len(results) and results[i] not in seen:
+                seen.add(results[i])
+                merged.append(results[i])
+    return merged
+
+async def search_many(
+    project_id: str,
+    location: str,
+    engine_id: str,
+    search_queries: list[str],
+    max_concurrency: int = 4,
+) -> list[str]:
+    """
+    Runs several searches concurrently, at most max_concurrency at a time,
+    and merges their results. Queries that only differ in case, spacing or
+    punctuation are only sent once.
+    """
+    queries = {}
+    for search_query in search_queries:
+        queries.setdefault(normalize_query(search_query), search_query)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(search_query):
+        async with semaphore:
+            return await async_search(project_id, location, engine_id, search_query)
+
+    result_lists = await asyncio.gather(*(run(search_query) for search_query in queries.values()))
+    return merge_results(result_lists)
+
+@lru_cache(maxsize=1)
+def datastore_config() -> dict:
+    """
+    Reads the datastore settings from the environment once, the first
+    time they are needed.
+    """
+    return {
+        "project_id": os.environ.get("DATASTORE_PROJECT_ID"),
+        "engine_id": os.environ.get("DATASTORE_ENGINE_ID"),
+        "location": os.environ.get("DATASTORE_LOCATION", "global"),
+        # "vertex" for Vertex AI Search, or "local" for the offline index of the docs
+        "backend": os.environ.get("DATASTORE_BACKEND", "vertex"),
+        "max_concurrency": int(os.environ.get("DATASTORE_MAX_CONCURRENCY", "4")),
+        # Approximate number of tokens of search results given to the model, 0 for no limit
+        "token_budget": int(os.environ.get("DATASTORE_TOKEN_BUDGET", "2000")),
+        "duplicate_threshold": float(os.environ.get("DATASTORE_DUPLICATE_THRESHOLD", "0.8")),
+    }
+
+def warm_up():
+    """
+    Creates the search client for the configured location ahead of time,
+    so the first question doesn't pay for setting up the connection. With
+    the local backend, this loads (or builds) the local index instead.
+    Problems are logged rather than raised, so importing the agent still
+    works without credentials.
+    """
+    config = datastore_config()
+    try:
+        if config["backend"] == "local":
+            local_search.get_index()
+        else:
+            get_client(config["location"])
+    except Exception as e:
+        logging.warning(f"Unable to warm up the datastore client: {e}")
+
+async def datastore_search_tool( search_queries: list[str] ):
     """
     Searches store information for the requested information.
 
     Args:
-        search_query (str): What information about the product are we looking for?
-    """
-    project_id=os.environ.get("DATASTORE_PROJECT_ID")
-    engine_id=os.environ.get("DATASTORE_ENGINE_ID")
-    location=os.environ.get("DATASTORE_LOCATION", "global")
-    logging.info(f"project_id={project_id} engine_id={engine_id} location={location}")
-    return search(
-        project_id=project_id,
-        engine_id=engine_id,
-        location=location,
-        search_query=search_query,
+        search_queries (list[str]): What information about the product are we looking for?
+            Give several to look up several things at once, or a list of
+            one for a single lookup.
+    """
+    config = datastore_config()
+    # The model sometimes sends a single query as a plain string
+    if isinstance(search_queries, str):
+        search_queries = [search_queries]
+    logging.info(f"project_id={config['project_id']} engine_id={config['engine_id']} location={config['location']}")
+    results = await search_many(
+        project_id=config["project_id"],
+        engine_id=config["engine_id"],
+        location=config["location"],
+        search_queries=search_queries,
+        max_concurrency=config["max_concurrency"],
     )
+
+    # Drop duplicated text and keep the results within the token budget
+    results, _ = chunk_filter.filter_chunks(
+        results,
+        token_budget=config["token_budget"],
+        duplicate_threshold=config["duplicate_threshold"],
+    )
+    return results
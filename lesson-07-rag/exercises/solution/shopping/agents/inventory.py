@@ -1,24 +1,21 @@
 import os
 from pydantic import BaseModel, Field
 from google.adk.agents import Agent, LlmAgent
-from toolbox_core import ToolboxSyncClient
+from .prompt_registry import read_prompt
+from .toolbox_tools import get_connection
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 # Connect to Toolbox
 toolbox_url = os.environ.get("TOOLBOX_URL", "http://127.0.0.1:5001")
-print(f"Connecting to Toolbox at {toolbox_url}")
-db_client = ToolboxSyncClient(toolbox_url)
+db_client = get_connection(toolbox_url)
 
 # Load the tool from the toolbox (MCP)
 # Assumes a tool named "check-inventory" exists in the toolbox configuration
-check_inventory_tool = db_client.load_tool("check-inventory")
+check_inventory_tool = db_client.tool("check-inventory", cached=True, key="product_id")
+
+# Checks a list of products, such as a whole cart, in one round-trip
+check_inventory_bulk_tool = db_client.tool("check-inventory-bulk", cached=True, key="product_id")
 
 inventory_instruction = read_prompt("inventory-prompt.txt")
 
@@ -27,7 +24,9 @@ inventory_agent = Agent(
     description="Checks product inventory availability.",
     model=model,
     instruction=inventory_instruction,
-    tools=[check_inventory_tool],
+    tools=[check_inventory_tool, check_inventory_bulk_tool],
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
 )
 
 class InventoryData(BaseModel):
@@ -41,5 +40,7 @@ inventory_data_agent = LlmAgent(
     model=model,
     instruction="Check the inventory for the given product ID and return the details.",
     tools=[check_inventory_tool],
+    before_tool_callback=db_client.cache.before_tool,
+    after_tool_callback=db_client.cache.after_tool,
     output_schema=InventoryData
 )
\ No newline at end of file
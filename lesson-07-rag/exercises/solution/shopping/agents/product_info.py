@@ -1,17 +1,14 @@
-import os
 from google.adk.agents import Agent, LlmAgent
-from .datastore import datastore_search_tool
+from .datastore import datastore_search_tool, warm_up
+from .prompt_registry import read_prompt
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 qa_instruction = read_prompt("product-qa-prompt.txt")
 
+# Set up the Vertex AI Search connection now instead of on the first question
+warm_up()
+
 product_qa_agent = LlmAgent(
     name="product_qa_agent",
     description="Answers questions about product details, features, and manuals.",
@@ -3,23 +3,17 @@ import random
 from typing import AsyncGenerator
 from google.adk.agents import Agent, LlmAgent, BaseAgent, InvocationContext
 from google.adk.events import Event
-from toolbox_core import ToolboxSyncClient
+from .prompt_registry import read_prompt
+from .toolbox_tools import get_connection
 
 model = "gemini-2.5-flash"
 
-def read_prompt(filename):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(script_dir, "../prompts", filename)
-    with open(file_path, "r") as f:
-        return f.read()
-
 # Connect to Toolbox
 toolbox_url = os.environ.get("TOOLBOX_URL", "http://127.0.0.1:5001")
-print(f"Connecting to Toolbox at {toolbox_url}")
-db_client = ToolboxSyncClient(toolbox_url)
+db_client = get_connection(toolbox_url)
 
 # Load the tool from the toolbox (MCP)
-search_products_tool = db_client.load_tool("search-products")
+search_products_tool = db_client.tool("search-products")
 
 search_instruction = read_prompt("search-prompt.txt")
 search_broad_instruction = read_prompt("search-broad-prompt.txt")
@@ -0,0 +1,379 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional
+import aiohttp
+from toolbox_core import ToolboxClient
+
+# Toolbox tools that don't need the Toolbox server until they are used, and
+# that don't hold up the agents while they wait for the database.
+#
+# Creating a ToolboxSyncClient and loading each tool with load_tool() at
+# import makes a round-trip to Toolbox for every tool, and the agent can't
+# start at all if Toolbox isn't running yet. Instead, each module asks for
+# its tools with
+#     get_connection(toolbox_url).tool("get-order")
+# which returns a LazyTool right away. Every module using the same URL
+# shares one connection, and so one client.
+#
+# The tools from a ToolboxSyncClient are plain functions, so ADK calls them
+# directly on its event loop, and nothing else runs until the database
+# answers. The sub-agents of a ParallelAgent end up waiting for the database
+# one after the other. A LazyTool is an async function instead. The request
+# itself is made by an async ToolboxClient on an event loop of its own,
+# shared by every connection, so ADK's event loop keeps running the other
+# agents while it waits. All the requests to one Toolbox server go through
+# the same pool of HTTP connections.
+#
+# The connection loads every tool in a single load_toolset() call, in the
+# background, and keeps retrying until Toolbox is reachable. If a tool is
+# used before that has worked, it loads the tools itself and raises the
+# error if Toolbox still can't be reached. Loading gives up after
+# TOOLBOX_LOAD_TIMEOUT seconds, so a Toolbox server that takes connections
+# but never answers can't hold up the agents for good.
+#
+# Each connection also has a ToolCache for the tools that only read from
+# the database. See ToolCache for how agents use it.
+
+# Seconds to wait between background attempts, doubling up to the maximum
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+
+# Seconds to wait for Toolbox to send the tools
+LOAD_TIMEOUT = float(os.environ.get("TOOLBOX_LOAD_TIMEOUT", "10"))
+
+# How many requests to each Toolbox server can be open at the same time
+POOL_SIZE = int(os.environ.get("TOOLBOX_POOL_SIZE", "20"))
+
+# How many recent invocations the ToolCache keeps results for. 0 turns it off.
+CACHE_INVOCATIONS = int(os.environ.get("TOOLBOX_CACHE_INVOCATIONS", "64"))
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def toolbox_loop() -> asyncio.AbstractEventLoop:
+    """The event loop, running in its own thread, that makes every Toolbox request."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="toolbox-loop", daemon=True).start()
+        return _loop
+
+def rows(response) -> list:
+    """The rows in a Toolbox tool's response, which holds them as a JSON string."""
+    result = response.get("result") if isinstance(response, dict) else response
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return []
+    if not isinstance(result, list):
+        return []
+    return [row for row in result if isinstance(row, dict)]
+
+class ToolCache:
+    """
+    Remembers what the read tools returned for the rest of an invocation,
+    which is one turn of the conversation, so each turn reads an order from
+    the database at most once however many agents look at it. When a write
+    tool is used, everything the read tools returned in that invocation is
+    forgotten, since any of it may have changed. The next turn always reads
+    the database again.
+
+    A read tool can be given the field that identifies what it reads, such
+    as order_id. Its results are then kept by that field instead of by tool,
+    so get-order and get-open-order-for-user share what they read: every row
+    a read tool returns is kept under its order ID, and a later get-order
+    for that order is answered from the cache.
+
+    While a read is being made, the same read from another agent, like a
+    sibling in a ParallelAgent, waits for it instead of going to the
+    database as well.
+
+    Agents that use these tools take before_tool and after_tool as their
+    before_tool_callback and after_tool_callback. hits and misses count
+    how often each read tool was answered from the cache.
+    """
+
+    def __init__(self, max_invocations: int = CACHE_INVOCATIONS):
+        self.max_invocations = max_invocations
+        self.reads = set()
+        self.writes = set()
+        # The field that identifies what each read tool reads, by tool name
+        self.keys = {}
+        # What was read in each invocation, by key. A value is an
+        # asyncio.Future while the read is still being made.
+        self.invocations = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.invalidations = 0
+
+    def key(self, tool_name: str, args: dict) -> tuple:
+        field = self.keys.get(tool_name)
+        if field is not None and args.get(field) is not None:
+            return field, str(args[field])
+        return tool_name, json.dumps(args, sort_keys=True, default=str)
+
+    def entries(self, invocation_id: str) -> dict:
+        """What was read in an invocation. Call with the lock held."""
+        entries = self.invocations.get(invocation_id)
+        if entries is None:
+            entries = self.invocations[invocation_id] = {}
+            while len(self.invocations) > self.max_invocations:
+                self.invocations.popitem(last=False)
+        self.invocations.move_to_end(invocation_id)
+        return entries
+
+    async def before_tool(self, tool, args: dict, tool_context):
+        if self.max_invocations <= 0 or tool.name not in self.reads:
+            return None
+        key = self.key(tool.name, args)
+        with self.lock:
+            entries = self.entries(tool_context.invocation_id)
+            entry = entries.get(key)
+            if entry is None:
+                pending = entries[key] = asyncio.get_running_loop().create_future()
+                self.misses[tool.name] += 1
+        if entry is None:
+            return await self.read(tool, args, tool_context, entries, key, pending)
+        if isinstance(entry, asyncio.Future):
+            entry = await asyncio.shield(entry)
+            if entry is None:
+                # The read failed, so this call makes its own
+                return None
+        with self.lock:
+            self.hits[tool.name] += 1
+        return entry
+
+    async def read(self, tool, args: dict, tool_context, entries: dict, key: tuple, pending: asyncio.Future):
+        """Run a read tool for before_tool, and keep what it returns."""
+        try:
+            response = await tool.run_async(args=args, tool_context=tool_context)
+        except BaseException:
+            with self.lock:
+                if entries.get(key) is pending:
+                    del entries[key]
+            pending.set_result(None)
+            raise
+        # Kept the way ADK passes it to the model, which needs a dict
+        if not isinstance(response, dict):
+            response = {"result": response}
+        field = self.keys.get(tool.name)
+        with self.lock:
+            # Unless a write has cleared the invocation while it was read
+            if self.invocations.get(tool_context.invocation_id) is entries:
+                entries[key] = response
+                if field is not None:
+                    for row in rows(response):
+                        if row.get(field) is not None:
+                            entries.setdefault((field, str(row[field])), {"result": json.dumps([row], default=str)})
+        pending.set_result(response)
+        # Returning the response means ADK doesn't run the tool again
+        return response
+
+    def after_tool(self, tool, args: dict, tool_context, tool_response):
+        if self.max_invocations > 0 and tool.name in self.writes:
+            self.clear(tool_context.invocation_id)
+        # Returning None leaves the tool's response as it is
+        return None
+
+    def clear(self, invocation_id: str):
+        """Forget what the read tools returned in an invocation."""
+        with self.lock:
+            if self.invocations.pop(invocation_id, None):
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            tools = {}
+            for name in sorted(self.reads):
+                lookups = self.hits[name] + self.misses[name]
+                tools[name] = {
+                    "hits": self.hits[name],
+                    "misses": self.misses[name],
+                    "hit_ratio": self.hits[name] / lookups if lookups else 0.0,
+                }
+            hits = sum(self.hits.values())
+            lookups = hits + sum(self.misses.values())
+            return {
+                "invocations": len(self.invocations),
+                "hits": hits,
+                "misses": lookups - hits,
+                "invalidations": self.invalidations,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "tools": tools,
+            }
+
+class ToolboxConnection:
+
+    def __init__(self, url: str, pool_size: int = POOL_SIZE):
+        self.url = url
+        self.pool_size = pool_size
+        self.loop = toolbox_loop()
+        self.session = None
+        self.client = None
+        self.tools = {}
+        self.names = set()
+        self.names_lock = threading.Lock()
+        # Created on the Toolbox loop the first time it is needed
+        self.load_lock = None
+        self.background = None
+        self.cache = ToolCache()
+
+    def run(self, coroutine):
+        """Start a coroutine on the Toolbox loop, returning a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def tool(
+        self,
+        name: str,
+        cached: bool = False,
+        clears_cache: bool = False,
+        key: Optional[str] = None,
+    ) -> "LazyTool":
+        """A tool from this Toolbox server.
+
+        Args:
+            name: The name of the tool in tools.yaml.
+            cached: The tool only reads, so its results can be kept in the cache.
+            clears_cache: The tool writes, so using it clears the cache.
+            key: The field that identifies the rows a cached tool reads, such
+                as order_id. Tools with the same key share cached rows.
+        """
+        with self.names_lock:
+            self.names.add(name)
+        if cached:
+            self.cache.reads.add(name)
+            if key is not None:
+                self.cache.keys[name] = key
+        if clears_cache:
+            self.cache.writes.add(name)
+        self.start_background_load()
+        return LazyTool(self, name)
+
+    async def load(self):
+        """Connect, and load every tool that has been asked for."""
+        if self.load_lock is None:
+            self.load_lock = asyncio.Lock()
+        async with self.load_lock:
+            with self.names_lock:
+                missing = self.names - self.tools.keys()
+            if not missing:
+                return
+            if self.client is None:
+                print(f"Connecting to Toolbox at {self.url}")
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.pool_size),
+                )
+                self.client = ToolboxClient(self.url, session=self.session)
+            for tool in await asyncio.wait_for(self.client.load_toolset(), LOAD_TIMEOUT):
+                self.tools.setdefault(tool.__name__, tool)
+            # Anything that isn't in the default toolset is loaded on its own
+            for name in missing - self.tools.keys():
+                self.tools[name] = await asyncio.wait_for(self.client.load_tool(name), LOAD_TIMEOUT)
+
+    async def load_with_retry(self):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                await self.load()
+                return
+            except Exception as e:
+                logging.warning(f"Could not load tools from Toolbox at {self.url}, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def start_background_load(self):
+        with self.names_lock:
+            if self.background is not None and not self.background.done():
+                return
+            self.background = self.run(self.load_with_retry())
+
+    async def get(self, name: str):
+        tool = self.tools.get(name)
+        if tool is None:
+            await self.load()
+            tool = self.tools[name]
+        return tool
+
+    async def call(self, name: str, args: tuple, kwargs: dict):
+        tool = await self.get(name)
+        return await tool(*args, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+class LazyTool:
+    # Stands in for a Toolbox tool until it is needed. ADK reads the tool's
+    # description and parameters from __doc__ and __signature__ the first
+    # time it builds a request to the model, which is when the real tool is
+    # loaded. The name is known without loading it.
+
+    def __init__(self, connection: ToolboxConnection, name: str):
+        self._connection = connection
+        self._tool_name = name
+        self.__qualname__ = f"{self.__class__.__qualname__}.{name}"
+
+    def resolve(self):
+        tool = self._connection.tools.get(self._tool_name)
+        if tool is not None:
+            return tool
+        # This runs on ADK's event loop, which nothing else can use while it
+        # waits, so it only waits as long as loading the tools is allowed to
+        future = self._connection.run(self._connection.get(self._tool_name))
+        try:
+            return future.result(LOAD_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(
+                f"Toolbox at {self._connection.url} did not send {self._tool_name} within {LOAD_TIMEOUT:.0f}s"
+            ) from None
+
+    @property
+    def __name__(self) -> str:
+        return self._tool_name
+
+    @property
+    def __doc__(self):
+        return self.resolve().__doc__
+
+    @property
+    def __signature__(self):
+        return self.resolve().__signature__
+
+    @property
+    def __annotations__(self):
+        return self.resolve().__annotations__
+
+    async def __call__(self, *args, **kwargs):
+        # Waiting on the Toolbox loop's future leaves the caller's loop free
+        future = self._connection.run(self._connection.call(self._tool_name, args, kwargs))
+        return await asyncio.wrap_future(future)
+
+    def __getattr__(self, name: str):
+        # Don't connect just because something like copy checks for __deepcopy__
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+def get_connection(url: str) -> ToolboxConnection:
+    with _connections_lock:
+        connection = _connections.get(url)
+        if connection is None:
+            connection = _connections[url] = ToolboxConnection(url)
+        return connection
+
+def cache_stats() -> dict:
+    """The ToolCache stats of each Toolbox connection, by URL."""
+    with _connections_lock:
+        connections = list(_connections.values())
+    return {connection.url: connection.cache.stats() for connection in connections}
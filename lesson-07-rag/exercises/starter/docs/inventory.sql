@@ -7,7 +7,8 @@ CREATE TABLE IF NOT EXISTS products (
     product_id VARCHAR(255) PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     description TEXT,
-    price DECIMAL(10, 2) NOT NULL
+    price DECIMAL(10, 2) NOT NULL,
+    FULLTEXT KEY products_search (name, description)
 );
 
 INSERT INTO inventory (product_id, quantity) VALUES
@@ -4,7 +4,89 @@ import json
 from datetime import datetime
 import sys
 from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import io
+import threading
+import time
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class SessionPool:
+    """
+    Keeps one pooled, keep-alive requests.Session per base URL (scheme and
+    host), so every request to the same agent server reuses its connections.
+    Connection errors are retried with backoff for every method; read errors
+    and 502/503/504 responses are only retried for idempotent methods, so a
+    message is never sent twice.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=300.0, retries=3, backoff=0.5):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.sessions = {}
+        self.cards = {}
+        self.lock = threading.Lock()
+
+    def base_url(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def create_session(self):
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session_for(self, url):
+        key = self.base_url(url)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.create_session()
+                self.sessions[key] = session
+            return session
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session_for(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session_for(url).post(url, **kwargs)
+
+    def get_card(self, url):
+        """Fetch an agent card, reusing a previous successful fetch of the same URL."""
+        with self.lock:
+            response = self.cards.get(url)
+        if response is None:
+            response = self.get(url)
+            if response.ok:
+                with self.lock:
+                    self.cards[url] = response
+        return response
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+            self.cards.clear()
+
+client = SessionPool()
 
 @contextmanager
 def output_manager(out, formats):
@@ -45,15 +127,19 @@ def output_csv(response, fh, request_payload):
         writer.writerow([request_id, "Error: Unexpected response format"])
     fh.flush()
 
-def output_txt(response, fh, request_payload):
-    response.raise_for_status()
-    data = response.json()
-    
+def get_prompt_text(request_payload):
     prompt_text = "N/A"
     if request_payload and "params" in request_payload and "message" in request_payload["params"] and \
        "parts" in request_payload["params"]["message"] and len(request_payload["params"]["message"]["parts"]) > 0 and \
        "text" in request_payload["params"]["message"]["parts"][0]:
         prompt_text = request_payload["params"]["message"]["parts"][0]["text"]
+    return prompt_text
+
+def output_txt(response, fh, request_payload):
+    response.raise_for_status()
+    data = response.json()
+    
+    prompt_text = get_prompt_text(request_payload)
 
     output_text = ""
     try:
@@ -92,17 +178,15 @@ def handle_card_request(url, handles):
         if not url.endswith("/"):
             url += "/"
         url += card_suffix
-    response = requests.get(url)
+    response = client.get_card(url)
     process_response(response, handles)
 
-def handle_prompt_request(url, prompt, task=None, context=None, message=None, handles={}):
+def build_payload(prompt, task=None, context=None, message=None, method="message/send"):
     if message:
         message_id = message
     else:
         message_id = datetime.now().isoformat()
 
-    print(f"Running test with message ID: {message_id}", file=sys.stderr)
-
     message_data = {
         "role": "user",
         "messageId": message_id,
@@ -121,46 +205,218 @@ def handle_prompt_request(url, prompt, task=None, context=None, message=None, ha
     payload = {
         "jsonrpc": "2.0",
         "id": message_id,
-        "method": "message/send",
+        "method": method,
         "params": {
             "message": message_data
         }
     }
-    response = requests.post(url, json=payload)
+    return payload
+
+def handle_prompt_request(url, prompt, task=None, context=None, message=None, handles={}, stream=False):
+    if stream:
+        handle_stream_request(url, prompt, task, context, message, handles)
+        return
+
+    payload = build_payload(prompt, task, context, message)
+
+    print(f"Running test with message ID: {payload['id']}", file=sys.stderr)
+
+    response = client.post(url, json=payload)
     process_response(response, handles, payload)
 
-def handle_infile(infile, handles):
-    input_stream = open(infile, 'r') if infile != '-' else sys.stdin
-    reader = csv.reader(input_stream)
-    
-    last_thread_key = None
+def read_sse_events(response):
+    """Yield the JSON payload of each server-sent event in a streaming response."""
+    data_lines = []
+    # chunk_size=None hands over each chunk as soon as it arrives instead of
+    # waiting for a full buffer, which would delay the first token.
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield json.loads("\n".join(data_lines))
+                data_lines = []
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield json.loads("\n".join(data_lines))
 
-    for row in reader:
+def event_text(event):
+    """
+    Get the response text carried by one streamed event, and whether it
+    replaces the text received so far instead of being appended to it.
+    """
+    result = event.get("result") or {}
+    kind = result.get("kind")
+    if kind == "artifact-update":
+        parts = result.get("artifact", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts), not result.get("append", False)
+    if kind == "task" and result.get("artifacts"):
+        parts = result["artifacts"][0].get("parts", [])
+        return "".join(part.get("text", "") for part in parts), True
+    return "", False
+
+def handle_stream_request(url, prompt, task=None, context=None, message=None, handles={}):
+    payload = build_payload(prompt, task, context, message, method="message/stream")
+    request_id = payload["id"]
+
+    print(f"Running streaming test with message ID: {request_id}", file=sys.stderr)
+
+    if 'txt' in handles:
+        handles['txt'].write(f"Prompt:\n {get_prompt_text(payload)}\n")
+        handles['txt'].write("\n")
+        handles['txt'].write("Response:\n ")
+        handles['txt'].flush()
+
+    start = time.perf_counter()
+    first_token = None
+    last_token = None
+    text = ""
+    with client.post(url, json=payload, stream=True, headers={"Accept": "text/event-stream"}) as response:
+        response.raise_for_status()
+        for event in read_sse_events(response):
+            if 'json' in handles:
+                handles['json'].write(json.dumps(event) + '\n')
+                handles['json'].flush()
+
+            chunk, replace = event_text(event)
+            if not chunk:
+                continue
+            now = time.perf_counter()
+            if first_token is None:
+                first_token = now - start
+            last_token = now - start
+
+            if replace and chunk.startswith(text):
+                # A full copy of the text so far, only the tail is new
+                new_text = chunk[len(text):]
+                text = chunk
+            elif replace:
+                new_text = chunk if not text else "\n" + chunk
+                text = chunk
+            else:
+                new_text = chunk
+                text += chunk
+            if 'txt' in handles and new_text:
+                handles['txt'].write(new_text)
+                handles['txt'].flush()
+    total = time.perf_counter() - start
+
+    timings = {
+        "ttft_ms": None if first_token is None else first_token * 1000,
+        "ttlt_ms": None if last_token is None else last_token * 1000,
+        "total_ms": total * 1000,
+    }
+    print(f"Message {request_id}: first token {format_ms(timings['ttft_ms'])} ms, "
+          f"last token {format_ms(timings['ttlt_ms'])} ms, total {format_ms(timings['total_ms'])} ms",
+          file=sys.stderr)
+
+    if 'txt' in handles:
+        handles['txt'].write("\n\n")
+        handles['txt'].flush()
+    if 'json' in handles:
+        handles['json'].write(json.dumps({"id": request_id, "timings": timings}) + '\n')
+        handles['json'].flush()
+    if 'csv' in handles:
+        writer = csv.writer(handles['csv'])
+        writer.writerow([request_id, text, format_ms(timings['ttft_ms']), format_ms(timings['ttlt_ms'])])
+        handles['csv'].flush()
+
+def format_ms(value):
+    return "" if value is None else f"{value:.1f}"
+
+def write_thread_header(fh, url, context):
+    fh.write("\n" + "=" * 40 + "\n")
+    fh.write(f"Thread ID: {context}\n")
+    fh.write(f"URL: {url}\n")
+    fh.write("=" * 40 + "\n\n")
+
+def read_rows(input_stream):
+    rows = []
+    for row in csv.reader(input_stream):
         if len(row) >= 2:
             url, prompt = row[0], row[1]
             message = row[2] if len(row) > 2 else None
             task = row[3] if len(row) > 3 else None
             context = row[4] if len(row) > 4 else None
-            
+            rows.append((url, prompt, message, task, context))
+    return rows
+
+def group_threads(rows):
+    # Rows that share a URL and context id belong to the same conversation
+    # and must be sent in order. Threads keep the order they first appear in.
+    threads = {}
+    for row in rows:
+        url, _, _, _, context = row
+        threads.setdefault((url, context), []).append(row)
+    return threads
+
+def run_thread(thread_key, thread_rows, handles, stream=False):
+    url, context = thread_key
+    if 'txt' in handles:
+        write_thread_header(handles['txt'], url, context)
+    for i, (url, prompt, message, task, context) in enumerate(thread_rows):
+        if i > 0 and 'txt' in handles:
+            handles['txt'].write("-" * 5 + "\n\n")
+        handle_prompt_request(url, prompt, task or None, context or None, message or None, handles, stream)
+
+def run_thread_buffered(thread_key, thread_rows, formats, stream=False):
+    buffers = {fmt: io.StringIO() for fmt in formats}
+    try:
+        run_thread(thread_key, thread_rows, buffers, stream)
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred in thread {thread_key[1]}: {e}", file=sys.stderr)
+    return buffers
+
+def handle_infile(infile, handles, concurrency=1, stream=False):
+    input_stream = open(infile, 'r') if infile != '-' else sys.stdin
+    try:
+        rows = read_rows(input_stream)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+
+    if concurrency <= 1:
+        last_thread_key = None
+        for (url, prompt, message, task, context) in rows:
             # Logic for Thread Header
             if 'txt' in handles:
+                fh = handles['txt']
                 current_thread_key = (url, context)
                 if current_thread_key != last_thread_key:
-                    fh = handles['txt']
-                    fh.write("\n" + "=" * 40 + "\n")
-                    fh.write(f"Thread ID: {context}\n")
-                    fh.write(f"URL: {url}\n")
-                    fh.write("=" * 40 + "\n\n")
+                    write_thread_header(fh, url, context)
                     last_thread_key = current_thread_key
                 else:
                     fh.write("-" * 5 + "\n\n")
 
-            handle_prompt_request(url, prompt, task or None, context or None, message or None, handles)
-    if input_stream is not sys.stdin:
-        input_stream.close()
+            handle_prompt_request(url, prompt, task or None, context or None, message or None, handles, stream)
+        return
+
+    # Independent threads run in parallel, each writing to its own buffers.
+    # Buffers are copied out in the order the threads appear in the input,
+    # so the output files stay grouped per thread.
+    threads = group_threads(rows)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_thread_buffered, thread_key, thread_rows, list(handles), stream)
+            for thread_key, thread_rows in threads.items()
+        ]
+        for future in futures:
+            buffers = future.result()
+            for fmt, fh in handles.items():
+                fh.write(buffers[fmt].getvalue())
+                fh.flush()
 
 def main():
-    parser = argparse.ArgumentParser(description='Make a request using A2A to an agent.')
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        from bench import bench_main
+        bench_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description='Make a request using A2A to an agent.',
+        epilog='Use "a2a.py bench --help" to benchmark an agent.',
+    )
     parser.add_argument('--url', type=str, help='The base URL for the agent')
     parser.add_argument('--card', action='store_true', help='Get the agent card.')
     parser.add_argument('--prompt', type=str, help='The prompt to send.')
@@ -170,6 +426,18 @@ def main():
     parser.add_argument('--out', type=str, help='The output file, or - for stdout.')
     parser.add_argument('--in', dest='infile', type=str, help='A CSV file to process, or - for stdin.')
     parser.add_argument('--format', nargs='+', choices=['json', 'csv', 'txt'], help='The output format(s).')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Number of conversation threads to run in parallel when using --in.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Use message/stream, write responses as they arrive and report time to first token.')
+    parser.add_argument('--pool-size', type=int, default=10,
+                        help='Maximum number of kept-alive connections per agent server.')
+    parser.add_argument('--connect-timeout', type=float, default=5.0, help='Connection timeout in seconds.')
+    parser.add_argument('--read-timeout', type=float, default=300.0, help='Read timeout in seconds.')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Number of retries for failed connections and idempotent requests.')
+    parser.add_argument('--backoff', type=float, default=0.5,
+                        help='Backoff factor in seconds between retries.')
 
     args = parser.parse_args()
 
@@ -181,6 +449,8 @@ def main():
     message = args.message
     out = args.out
     infile = args.infile
+    concurrency = args.concurrency
+    stream = args.stream
     
     # Logic for format defaulting
     if args.format:
@@ -197,16 +467,30 @@ def main():
     if (card or prompt) and not url:
         parser.error("--url is required when using --card or --prompt.")
 
+    if concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+
+    global client
+    client = SessionPool(
+        pool_size=max(args.pool_size, concurrency),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+    )
+
     with output_manager(out, out_formats) as handles:
         try:
             if infile:
-                handle_infile(infile, handles)
+                handle_infile(infile, handles, concurrency, stream)
             elif card:
                 handle_card_request(url, handles)
             elif prompt:
-                handle_prompt_request(url, prompt, task, context, message, handles)
+                handle_prompt_request(url, prompt, task, context, message, handles, stream)
         except requests.exceptions.RequestException as e:
             print(f"An error occurred: {e}")
+        finally:
+            client.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,225 @@
+import argparse
+import itertools
+import json
+import math
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from a2a import SessionPool, build_payload, group_threads, read_rows
+
+# Latency and throughput benchmark for A2A agents.
+# Replays the threads of a scenario CSV against their message/send endpoints
+# until a request count or duration is reached, then reports latency
+# percentiles, throughput and error rate, overall and per URL.
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize_samples(samples, elapsed):
+    latencies = sorted(sample["latency"] * 1000 for sample in samples)
+    errors = sum(1 for sample in samples if not sample["ok"])
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "requests_per_sec": count / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "min": latencies[0] if latencies else None,
+            "mean": sum(latencies) / count if count else None,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+def summarize(samples, elapsed):
+    summary = summarize_samples(samples, elapsed)
+    summary["duration_sec"] = elapsed
+    by_url = {}
+    for sample in samples:
+        by_url.setdefault(sample["url"], []).append(sample)
+    summary["urls"] = {
+        url: summarize_samples(url_samples, elapsed)
+        for url, url_samples in by_url.items()
+    }
+    return summary
+
+def is_error_response(response):
+    if response.status_code >= 400:
+        return True
+    try:
+        data = response.json()
+    except ValueError:
+        return True
+    return "error" in data or "result" not in data
+
+def rebase_url(url, base_url):
+    """Keep the path of a scenario URL, but point it at another server."""
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+class BenchRunner:
+    """
+    Hands out scenario threads to worker threads and collects a sample
+    for every request. Each worker runs the turns of a thread in order,
+    using a fresh context id for every replay of the thread.
+    """
+
+    def __init__(self, threads, max_requests=None, duration=None, timeout=60.0, concurrency=1):
+        self.threads = itertools.cycle(list(threads.items()))
+        self.max_requests = max_requests
+        self.duration = duration
+        self.concurrency = concurrency
+        # Failed requests are not retried, so they show up in the error rate.
+        self.client = SessionPool(pool_size=concurrency, read_timeout=timeout, retries=0)
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.replay = 0
+        self.samples = []
+        self.deadline = None
+
+    def next_thread(self):
+        with self.lock:
+            self.replay += 1
+            return self.replay, next(self.threads)
+
+    def claim_request(self):
+        with self.lock:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                return False
+            if self.max_requests is not None and self.sent >= self.max_requests:
+                return False
+            self.sent += 1
+            return True
+
+    def send(self, url, prompt, task, context):
+        payload = build_payload(prompt, task, context)
+        start = time.perf_counter()
+        try:
+            response = self.client.post(url, json=payload)
+            ok = not is_error_response(response)
+        except requests.exceptions.RequestException:
+            ok = False
+        latency = time.perf_counter() - start
+        with self.lock:
+            self.samples.append({"url": url, "latency": latency, "ok": ok})
+
+    def worker(self):
+        while True:
+            replay, (_, thread_rows) = self.next_thread()
+            for (url, prompt, _, task, context) in thread_rows:
+                if not self.claim_request():
+                    return
+                context = f"{context}-{replay}" if context else None
+                self.send(url, prompt, task or None, context)
+
+    def run(self):
+        start = time.perf_counter()
+        if self.duration is not None:
+            self.deadline = start + self.duration
+        workers = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.concurrency)]
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            self.client.close()
+        return time.perf_counter() - start
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+def print_report(summary, fh):
+    rows = [("ALL", summary)] + list(summary["urls"].items())
+    fh.write(f"Duration: {summary['duration_sec']:.2f}s\n")
+    fh.write(f"{'url':<50} {'reqs':>7} {'rps':>8} {'err%':>6} "
+             f"{'p50':>8} {'p90':>8} {'p99':>8}\n")
+    for url, stats in rows:
+        latency = stats["latency_ms"]
+        fh.write(f"{url:<50} {stats['requests']:>7} {stats['requests_per_sec']:>8.2f} "
+                 f"{stats['error_rate'] * 100:>6.1f} {format_ms(latency['p50']):>8} "
+                 f"{format_ms(latency['p90']):>8} {format_ms(latency['p99']):>8}\n")
+    fh.flush()
+
+def bench_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='a2a.py bench',
+        description='Benchmark the latency and throughput of A2A agents by replaying a scenario CSV.',
+    )
+    parser.add_argument('--in', dest='infile', type=str, required=True,
+                        help='A scenario CSV file to replay, or - for stdin.')
+    parser.add_argument('--requests', type=int, help='Stop after sending this many requests.')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds.')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Number of threads to replay in parallel.')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds.')
+    parser.add_argument('--out', type=str, help='Write a JSON summary to this file, or - for stdout.')
+    parser.add_argument('--stub', action='store_true',
+                        help='Run the requests against a local stub agent instead of the CSV URLs.')
+    parser.add_argument('--stub-latency', type=float, default=0.0,
+                        help='Seconds the stub agent waits before answering.')
+
+    args = parser.parse_args(argv)
+
+    if args.requests is None and args.duration is None:
+        parser.error("One of --requests or --duration is required.")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+
+    input_stream = open(args.infile, 'r') if args.infile != '-' else sys.stdin
+    try:
+        rows = read_rows(input_stream)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+    if not rows:
+        parser.error("The scenario file has no requests.")
+
+    server = None
+    if args.stub:
+        from stub_agent import start_stub_server, stub_server_url
+        server = start_stub_server(latency=args.stub_latency)
+        base_url = stub_server_url(server)
+        rows = [(rebase_url(row[0], base_url),) + row[1:] for row in rows]
+
+    try:
+        runner = BenchRunner(group_threads(rows), args.requests, args.duration,
+                             args.timeout, args.concurrency)
+        started_at = datetime.now(timezone.utc).isoformat()
+        elapsed = runner.run()
+    finally:
+        if server:
+            server.shutdown()
+
+    summary = summarize(runner.samples, elapsed)
+    summary["started_at"] = started_at
+    summary["config"] = {
+        "infile": args.infile,
+        "requests": args.requests,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "stub": args.stub,
+    }
+
+    print_report(summary, sys.stderr)
+    if args.out == '-':
+        sys.stdout.write(json.dumps(summary, indent=2) + '\n')
+    elif args.out:
+        with open(args.out, 'w') as fh:
+            fh.write(json.dumps(summary, indent=2) + '\n')
+
+if __name__ == '__main__':
+    bench_main()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A minimal A2A agent that answers every message by echoing the prompt back.
+# It lets the a2a.py client, and its benchmarks, run without a real agent
+# or network access.
+
+CARD_SUFFIX = ".well-known/agent-card.json"
+
+def build_card(base_url):
+    return {
+        "name": "stub_agent",
+        "description": "A local stub agent that echoes prompts back.",
+        "url": base_url,
+        "version": "1.0.0",
+        "protocolVersion": "0.3.0",
+        "capabilities": {"streaming": True},
+        "defaultInputModes": ["text/plain"],
+        "defaultOutputModes": ["text/plain"],
+        "skills": [],
+    }
+
+def build_result(message, text):
+    return {
+        "kind": "task",
+        "id": message.get("taskId") or str(uuid.uuid4()),
+        "contextId": message.get("contextId") or str(uuid.uuid4()),
+        "status": {"state": "completed"},
+        "artifacts": [
+            {
+                "artifactId": str(uuid.uuid4()),
+                "parts": [{"kind": "text", "text": text}],
+            }
+        ],
+    }
+
+class StubAgentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.path.endswith(CARD_SUFFIX):
+            self.send_json(404, {"error": "Not found"})
+            return
+        base_path = self.path[:-len(CARD_SUFFIX)]
+        host, port = self.server.server_address[:2]
+        self.send_json(200, build_card(f"http://{host}:{port}{base_path}"))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"jsonrpc": "2.0", "id": None,
+                                 "error": {"code": -32700, "message": "Parse error"}})
+            return
+
+        request_id = payload.get("id")
+        method = payload.get("method")
+        if method not in ("message/send", "message/stream"):
+            self.send_json(200, {"jsonrpc": "2.0", "id": request_id,
+                                 "error": {"code": -32601, "message": f"Method not found: {method}"}})
+            return
+
+        message = payload.get("params", {}).get("message", {})
+        text = "".join(part.get("text", "") for part in message.get("parts", []))
+
+        if method == "message/stream":
+            self.send_stream(request_id, message, f"Echo: {text}")
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        self.send_json(200, {"jsonrpc": "2.0", "id": request_id,
+                             "result": build_result(message, f"Echo: {text}")})
+
+    def send_event(self, request_id, result):
+        data = json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+        self.send_chunk(f"data: {data}\n\n".encode("utf-8"))
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_stream(self, request_id, message, text):
+        """
+        Answer message/stream with server-sent events. The latency is spread
+        over the words of the answer, which are sent as separate artifact
+        chunks.
+        """
+        task_id = message.get("taskId") or str(uuid.uuid4())
+        context_id = message.get("contextId") or str(uuid.uuid4())
+        artifact_id = str(uuid.uuid4())
+        words = text.split(" ")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        self.send_event(request_id, {"kind": "status-update", "taskId": task_id, "contextId": context_id,
+                                     "status": {"state": "working"}, "final": False})
+        for i, word in enumerate(words):
+            if self.server.latency:
+                time.sleep(self.server.latency / len(words))
+            self.send_event(request_id, {
+                "kind": "artifact-update",
+                "taskId": task_id,
+                "contextId": context_id,
+                "artifact": {
+                    "artifactId": artifact_id,
+                    "parts": [{"kind": "text", "text": word if i == 0 else " " + word}],
+                },
+                "append": i > 0,
+                "lastChunk": i == len(words) - 1,
+            })
+        self.send_event(request_id, {"kind": "status-update", "taskId": task_id, "contextId": context_id,
+                                     "status": {"state": "completed"}, "final": True})
+        self.send_chunk(b"")
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0, verbose=False):
+    """
+    Start the stub agent on a background thread.
+    Use port 0 to pick a free port. The caller should call shutdown() on
+    the returned server when done.
+    """
+    server = ThreadingHTTPServer((host, port), StubAgentHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def stub_server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stub A2A agent that echoes prompts.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='The host to listen on.')
+    parser.add_argument('--port', type=int, default=8000, help='The port to listen on.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds to wait before answering each message.')
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.latency, verbose=True)
+    print(f"Stub agent listening on {stub_server_url(server)}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()